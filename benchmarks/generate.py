@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Writes synthetic, seeded inputs for all three tools in the formats of the committed samples:
+fileA.txt (symbols), fileB.txt (gateway risks), fileC.txt (transports), portfolio.csv and
+corporate_actions.csv. The same seed and scale always produce the same files.
+
+Usage: python -m benchmarks.generate DIRECTORY [--scale N] [--seed S]
+
+Scale is the number of symbols and portfolio holdings; the other files grow with it.
+"""
+import csv
+import os
+import random
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+GROUPS = [(exchange, group) for exchange in ('exchangeA', 'exchangeB', 'exchangeC') for group in ('groupA', 'groupB', 'groupC')]
+CURRENCIES = ['USD', 'USD', 'USD', 'CAD', 'GBp']
+COUNTRIES = {'USD': 'US', 'CAD': 'CA', 'GBp': 'GB'}
+START = date(2015, 6, 22)
+
+FILENAMES = {
+  'symbols': 'fileA.txt',
+  'gateway_risks': 'fileB.txt',
+  'transports': 'fileC.txt',
+  'portfolio': 'portfolio.csv',
+  'actions': 'corporate_actions.csv',
+}
+
+
+class Sizes(object):
+  """
+  How many records of each kind a scale produces. The actions file covers a market of
+  market_factor times as many symbols as the portfolio holds.
+  """
+
+  def __init__(self, scale, market_factor=10, actions_per_symbol=2, days=250, transports_per_symbol=1):
+    self.symbols = scale
+    self.holdings = scale
+    self.market = scale * market_factor
+    self.actions = self.market * actions_per_symbol
+    self.days = days
+    self.transports = scale * transports_per_symbol
+
+
+def symbol(i):
+  return 'S%07d' % i
+
+
+def write_symbols(filename, sizes, generator):
+  with open(filename, 'w') as f:
+    for i in xrange(sizes.symbols):
+      f.write(symbol(i) + '\n')
+
+
+def write_gateway_risks(filename, sizes, generator):
+  """
+  One line per exchange group, each carrying risk limits for about 90% of the symbols.
+  """
+  with open(filename, 'w') as f:
+    for exchange, group in GROUPS:
+      risks = ['%s %d %d' % (symbol(i), generator.randint(1, 100), generator.randint(1, 100))
+               for i in xrange(sizes.symbols) if generator.random() < 0.9]
+      f.write('%s_%s.gateway_risk=%s\n' % (exchange, group, ' '.join(risks)))
+
+
+def write_transports(filename, sizes, generator, mismatch_rate=0.05):
+  with open(filename, 'w') as f:
+    for i in xrange(sizes.transports):
+      y, z = generator.randint(0, 99), generator.randint(0, 199)
+      port = 50000 + 200 * y + z
+      if generator.random() < mismatch_rate:
+        port += generator.randint(1, 100)
+      f.write('transport.groupB_%d.exchangeA_%d=%d ;239.189.%d.%d 7990\n' % (i // 16, i % 16, port, y, z))
+
+
+def write_portfolio(filename, sizes, generator):
+  with open(filename, 'w') as f:
+    f.write("Symbol,Description,Country,Shares,Price,Currency,Total Value\n")
+    for i in xrange(sizes.holdings):
+      currency = generator.choice(CURRENCIES)
+      shares, price = generator.randint(1, 50000), round(generator.uniform(1, 1000), 2)
+      f.write('%s,Company %d Inc,%s,%d,%s,%s,"%s"\n' % (symbol(i), i, COUNTRIES[currency], shares, price, currency,
+                                                        format(shares * price, ',.2f')))
+
+
+def write_actions(filename, sizes, generator):
+  """
+  Actions in date order over the whole market, mostly cash dividends, with occasional splits,
+  stock dividends, name changes and symbol changes. Renamed symbols keep receiving actions
+  under their new tickers.
+  """
+  tickers = [symbol(i) for i in xrange(sizes.market)]
+  renamed = 0
+  with open(filename, 'wb') as f:
+    out = csv.writer(f, lineterminator='\n')
+    out.writerow(['Day', 'Symbol', 'Corporate Action'])
+    per_day = max(1, sizes.actions // sizes.days)
+    for n in xrange(sizes.actions):
+      day = (START + timedelta(n // per_day)).strftime('%m/%d/%Y')
+      i = generator.randrange(sizes.market)
+      kind = generator.random()
+      if kind < 0.7:
+        action = 'Cash dividend - %s %s/share' % (round(generator.uniform(0.01, 2), 2), generator.choice(CURRENCIES))
+      elif kind < 0.8:
+        action = 'Stock split - %d for %d' % generator.choice([(2, 1), (3, 1), (1, 3), (9, 10)])
+      elif kind < 0.9:
+        action = 'Stock dividend - %s/share' % round(generator.uniform(1.01, 1.1), 3)
+      elif kind < 0.95:
+        action = 'Name change - new name is "Company %d Holdings"' % i
+      else:
+        new_ticker = 'N%07d' % renamed
+        renamed += 1
+        action = 'Symbol change - new symbol is %s' % new_ticker
+      out.writerow([day, tickers[i], action])
+      if action.startswith('Symbol change'):
+        tickers[i] = new_ticker
+
+
+WRITERS = [
+  ('symbols', write_symbols),
+  ('gateway_risks', write_gateway_risks),
+  ('transports', write_transports),
+  ('portfolio', write_portfolio),
+  ('actions', write_actions),
+]
+
+
+def generate(directory, scale, seed=0):
+  """
+  Writes every input into directory and returns their paths by kind. Each file draws from its
+  own generator, so changing how one is written leaves the others unchanged.
+  """
+  sizes = Sizes(scale)
+  paths = {}
+  for offset, (kind, write) in enumerate(WRITERS):
+    paths[kind] = os.path.join(directory, FILENAMES[kind])
+    write(paths[kind], sizes, random.Random(seed * len(WRITERS) + offset))
+  return paths
+
+if __name__ == '__main__':
+  parser = ArgumentParser()
+  parser.add_argument('directory', help="Where to write the files")
+  parser.add_argument('--scale', help="Number of symbols and holdings", type=int, default=10000)
+  parser.add_argument('--seed', help="Random seed", type=int, default=0)
+  args = parser.parse_args()
+
+  if not os.path.isdir(args.directory):
+    os.makedirs(args.directory)
+  for kind, path in sorted(generate(args.directory, args.scale, args.seed).items()):
+    print "%-14s %s" % (kind, path)
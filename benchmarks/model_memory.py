@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Measures resident memory per million Holdings, ActionRecords and CashDividendActions, comparing
+the slotted problem3 models against the original __dict__-based ones.
+
+Usage: python -m benchmarks.model_memory [--records N]
+
+Each measurement runs in a fresh child process. Strings are built per record, as csv does.
+"""
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from multiprocessing import Process, Queue
+
+from problem3.actions import CashDividendAction
+from problem3.models import Holding, ActionRecord
+
+START = date(2000, 1, 1)
+
+
+class DictHolding(object):
+
+  def __init__(self, symbol, description, country, shares, price, currency, reinvest_dividends=False):
+    self.symbol = symbol
+    self.description = description
+    self.country = country
+    self.shares = shares
+    self.price = price
+    self.currency = currency
+    self.reinvest_dividends = reinvest_dividends
+
+
+class DictActionRecord(object):
+
+  def __init__(self, date, symbol, description):
+    self.date = date
+    self.symbol = symbol
+    self.description = description
+
+
+class DictCashDividendAction(object):
+
+  def __init__(self, value, currency):
+    self.value = value
+    self.currency = currency
+
+
+def holdings(cls, n):
+  return [cls('S%05d' % (i % 50000), 'Company %d' % (i % 50000), 'U' + 'S', i, i / 3.0, 'US' + 'D') for i in xrange(n)]
+
+
+def dict_records(n):
+  return [DictActionRecord(START + timedelta(i // 5000), 'S%05d' % (i % 50000), 'Cash dividend - %d USD/share' % (i % 100))
+          for i in xrange(n)]
+
+
+def slotted_records(n):
+  # CsvActionsSerializer shares one ordinal between all of a day's records
+  ordinals = {}
+  return [ActionRecord(ordinals.setdefault(i // 5000, (START + timedelta(i // 5000)).toordinal()), 'S%05d' % (i % 50000),
+                       'Cash dividend - %d USD/share' % (i % 100))
+          for i in xrange(n)]
+
+
+def actions(cls, n):
+  return [cls(i / 100.0, 'US' + 'D') for i in xrange(n)]
+
+
+CASES = [
+  ("Holding", lambda n: holdings(DictHolding, n), lambda n: holdings(Holding, n)),
+  ("ActionRecord", dict_records, slotted_records),
+  ("CashDividendAction", lambda n: actions(DictCashDividendAction, n), lambda n: actions(CashDividendAction, n)),
+]
+
+
+def resident_bytes():
+  with open('/proc/self/statm') as f:
+    return int(f.read().split()[1]) * 4096
+
+
+def _measure(build, n, results):
+  before = resident_bytes()
+  objects = build(n)
+  results.put(resident_bytes() - before)
+  del objects
+
+
+def measure(build, n):
+  results = Queue()
+  child = Process(target=_measure, args=(build, n, results))
+  child.start()
+  used = results.get()
+  child.join()
+  return used
+
+
+def main(n):
+  print "%-20s %14s %14s %8s" % ("MB per million", "__dict__", "__slots__", "saving")
+  for name, before, after in CASES:
+    old, new = [measure(build, n) * 1e6 / n / 2 ** 20 for build in (before, after)]
+    print "%-20s %14.1f %14.1f %7.0f%%" % (name, old, new, 100 * (1 - new / old))
+
+if __name__ == '__main__':
+  parser = ArgumentParser()
+  parser.add_argument('--records', help="Objects to build per measurement", type=int, default=1000000)
+  args = parser.parse_args()
+
+  main(args.records)
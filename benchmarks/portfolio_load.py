@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Compares CsvPortfolioSerializer.deserialize against the original DictReader/atoi/atof loader
+on synthetic portfolio files.
+
+Usage: python -m benchmarks.portfolio_load [--rows N [N ...]]
+
+Rows default to 10k, 100k and 1M; pass --rows 10000000 for the 10M case.
+"""
+import gc
+import os
+import random
+import time
+from argparse import ArgumentParser
+from csv import DictReader
+from locale import setlocale, atof, atoi, LC_ALL, Error
+from tempfile import mkstemp
+
+from benchmarks.generate import Sizes, write_portfolio
+from problem3.actions import CurrencyConverter
+from problem3.models import Holding, Portfolio
+from problem3.serializers import CsvPortfolioSerializer
+
+
+def dictreader_deserialize(iterable, currency_converter, reinvest_dividends=False):
+  """
+  The loader CsvPortfolioSerializer.deserialize replaced, kept as the baseline.
+  """
+  holdings = []
+  for row in DictReader(iterable):
+    holdings.append(Holding(row['Symbol'], row['Description'], row['Country'],
+                            atoi(row['Shares']), atof(row['Price']), row['Currency'], reinvest_dividends))
+  return Portfolio(holdings, currency_converter)
+
+
+def measure(deserialize, filename):
+  """
+  Times one load with the cyclic garbage collector paused, as timeit does, so that collections
+  triggered by the many new holdings do not dominate either loader's time.
+  """
+  collecting = gc.isenabled()
+  gc.disable()
+  try:
+    started = time.time()
+    with open(filename) as f:
+      deserialize(f, CurrencyConverter())
+    return time.time() - started
+  finally:
+    if collecting:
+      gc.enable()
+
+
+def main(sizes):
+  print "%10s %12s %12s %8s" % ("rows", "dictreader", "positional", "speedup")
+  for rows in sizes:
+    handle, filename = mkstemp(suffix='.csv')
+    os.close(handle)
+    try:
+      write_portfolio(filename, Sizes(rows), random.Random(0))
+      baseline = measure(dictreader_deserialize, filename)
+      fast = measure(CsvPortfolioSerializer.deserialize, filename)
+      print "%10d %11.3fs %11.3fs %7.1fx" % (rows, baseline, fast, baseline / fast)
+    finally:
+      os.remove(filename)
+
+if __name__ == '__main__':
+  parser = ArgumentParser()
+  parser.add_argument('--rows', help="Portfolio sizes to load", type=int, nargs='+', default=[10000, 100000, 1000000])
+  args = parser.parse_args()
+
+  try:
+    setlocale(LC_ALL, 'en_US.UTF-8')
+  except Error:
+    pass
+  main(args.rows)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""
+Times each stage of all three tools on inputs from {@link benchmarks.generate} and reports
+throughput, best and mean time and peak memory per benchmark, plus per-tool totals by stage,
+as JSON.
+
+Usage: python -m benchmarks.suite [--scale N] [--seed S] [--repeat R] [--tools T [T ...]]
+                                  [--data DIRECTORY] [--output FILE]
+                                  [--baseline FILE] [--tolerance FRACTION]
+
+Each benchmark runs in a fresh child process, so its peak memory is its own: peak_memory_kb
+is how far the child's peak resident size rose while the stage ran, on top of its inputs.
+With --baseline, throughput is compared against an earlier run's JSON; the comparison goes
+to stderr, and the exit status is 1 if any benchmark slowed down by more than --tolerance.
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from argparse import ArgumentParser
+from io import BytesIO
+from locale import setlocale, LC_ALL, Error
+from multiprocessing import Process, Queue
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import problem1
+import problem2
+from benchmarks.generate import generate
+from problem3.actions import CurrencyConverter
+from problem3.models import group_by_day
+from problem3.serializers import ActionParser, BinaryPortfolioSerializer, CsvActionsSerializer, CsvPortfolioSerializer
+from problem3.simulator import ActionsSimulator
+
+
+def load_portfolio(paths):
+  with open(paths['portfolio']) as f:
+    return CsvPortfolioSerializer.deserialize(f, CurrencyConverter())
+
+
+def load_actions(paths, symbols=None):
+  with open(paths['actions']) as f:
+    return CsvActionsSerializer.deserialize(f, symbols=symbols)
+
+
+def count_lines(path):
+  with open(path) as f:
+    return sum(1 for _ in f)
+
+
+# Each benchmark takes the input paths and returns (prepare, run, items): run(prepare()) is
+# the timed work, prepare runs untimed before every repeat, and items is what run processes.
+
+def bench_parse_exchanges(paths):
+  with open(paths['gateway_risks']) as f:
+    lines = [line.rstrip() for line in f]
+  items = sum(1 for _ in problem1.iter_gateway_risks(paths['gateway_risks']))
+  return lambda: lines, problem1.parse_exchanges, items
+
+
+def bench_parse_gateway_risks(paths):
+  items = sum(1 for _ in problem1.iter_gateway_risks(paths['gateway_risks']))
+  return lambda: paths['gateway_risks'], lambda p: list(problem1.iter_gateway_risks(p)), items
+
+
+def bench_load_gateway_limits(paths):
+  items = sum(1 for _ in problem1.iter_gateway_risks(paths['gateway_risks']))
+  return lambda: paths['gateway_risks'], problem1.load_gateway_limits, items
+
+
+def bench_load_gateway_risks(paths):
+  items = sum(1 for _ in problem1.iter_gateway_risks(paths['gateway_risks']))
+  return lambda: paths['gateway_risks'], problem1.GatewayRiskIndex.load, items
+
+
+def bench_missing_symbols(paths):
+  index = problem1.GatewayRiskIndex.load(paths['gateway_risks'])
+  with open(paths['symbols']) as f:
+    symbols = [line.rstrip() for line in f]
+  return lambda: symbols, lambda s: index.missing_from_all(s, problem1.DEFAULT_GROUPS), len(symbols)
+
+
+def bench_extract_transports(paths):
+  return lambda: paths['transports'], lambda p: list(problem2.extract_address_and_port(p)), count_lines(paths['transports'])
+
+
+def bench_find_mismatches(paths):
+  return lambda: paths['transports'], problem2.find_mismatches, count_lines(paths['transports'])
+
+
+def bench_parse_portfolio(paths):
+  return lambda: paths, load_portfolio, count_lines(paths['portfolio']) - 1
+
+
+def bench_parse_actions(paths):
+  symbols = load_portfolio(paths).symbols
+  return lambda: paths, lambda p: load_actions(p, symbols), count_lines(paths['actions']) - 1
+
+
+def bench_parse_descriptions(paths):
+  descriptions = [record.description for record in load_actions(paths)]
+  return lambda: descriptions, lambda d: [ActionParser.parse(description) for description in d], len(descriptions)
+
+
+def bench_simulate(paths):
+  portfolio = load_portfolio(paths)
+  days = [(day, list(actions)) for day, actions in group_by_day(load_actions(paths, portfolio.symbols))]
+
+  def simulate(portfolio):
+    simulator = ActionsSimulator(ActionParser())
+    for _, actions in days:
+      simulator.apply_day(actions, portfolio)
+
+  return lambda: load_portfolio(paths), simulate, sum(len(actions) for _, actions in days)
+
+
+def bench_recompute(paths):
+  portfolio = load_portfolio(paths)
+  return lambda: portfolio, lambda p: p.recompute(), len(portfolio.holdings)
+
+
+def bench_value(paths):
+  def prepare():
+    portfolio.recompute()
+    return portfolio
+  portfolio = load_portfolio(paths)
+  return prepare, lambda p: p.value(), len(portfolio.holdings)
+
+
+def bench_serialize_csv(paths):
+  portfolio = load_portfolio(paths)
+  return lambda: portfolio, CsvPortfolioSerializer.serialize, len(portfolio.holdings)
+
+
+def bench_serialize_binary(paths):
+  portfolio = load_portfolio(paths)
+  return lambda: portfolio, lambda p: BinaryPortfolioSerializer.serialize(p, BytesIO()), len(portfolio.holdings)
+
+
+# (tool, stage, name, benchmark)
+BENCHMARKS = [
+  ('problem1', 'parse', 'parse_exchanges', bench_parse_exchanges),
+  ('problem1', 'parse', 'parse_gateway_risks', bench_parse_gateway_risks),
+  ('problem1', 'parse', 'load_gateway_limits', bench_load_gateway_limits),
+  ('problem1', 'parse', 'load_gateway_risks', bench_load_gateway_risks),
+  ('problem1', 'query', 'missing_symbols', bench_missing_symbols),
+  ('problem2', 'parse', 'extract_transports', bench_extract_transports),
+  ('problem2', 'check', 'find_mismatches', bench_find_mismatches),
+  ('problem3', 'parse', 'parse_portfolio', bench_parse_portfolio),
+  ('problem3', 'parse', 'parse_actions', bench_parse_actions),
+  ('problem3', 'parse', 'parse_descriptions', bench_parse_descriptions),
+  ('problem3', 'simulate', 'simulate', bench_simulate),
+  ('problem3', 'value', 'recompute', bench_recompute),
+  ('problem3', 'value', 'value', bench_value),
+  ('problem3', 'serialize', 'serialize_csv', bench_serialize_csv),
+  ('problem3', 'serialize', 'serialize_binary', bench_serialize_binary),
+]
+
+
+def peak_rss_kb():
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(benchmark, paths, repeat, results):
+  try:
+    prepare, run, items = benchmark(paths)
+    times = []
+    before = peak_rss_kb()
+    for _ in xrange(repeat):
+      state = prepare()
+      started = time.time()
+      run(state)
+      times.append(time.time() - started)
+      del state
+    results.put({'items': items, 'times': times, 'peak_memory_kb': peak_rss_kb() - before, 'max_rss_kb': peak_rss_kb()})
+  except Exception as e:
+    results.put({'error': repr(e)})
+
+
+def measure(benchmark, paths, repeat):
+  """
+  Runs benchmark in a child process and returns its measurements.
+  """
+  results = Queue()
+  child = Process(target=_measure, args=(benchmark, paths, repeat, results))
+  child.start()
+  result = results.get()
+  child.join()
+  if 'error' in result:
+    raise RuntimeError("%s failed: %s" % (benchmark.__name__, result['error']))
+  return result
+
+
+def run(paths, repeat=3, tools=None):
+  """
+  Returns the results of every benchmark for tools (all of them by default) and the total of
+  each tool's best times by stage.
+  """
+  results, totals = [], {}
+  for tool, stage, name, benchmark in BENCHMARKS:
+    if tools and tool not in tools:
+      continue
+    measured = measure(benchmark, paths, repeat)
+    best = min(measured['times'])
+    results.append({
+      'name': '%s.%s' % (tool, name),
+      'tool': tool,
+      'stage': stage,
+      'items': measured['items'],
+      'seconds': best,
+      'mean_seconds': sum(measured['times']) / len(measured['times']),
+      'throughput': measured['items'] / best if best else None,
+      'peak_memory_kb': measured['peak_memory_kb'],
+      'max_rss_kb': measured['max_rss_kb'],
+    })
+    stages = totals.setdefault(tool, {'seconds': 0.0, 'stages': {}})
+    stages['seconds'] += best
+    stages['stages'][stage] = stages['stages'].get(stage, 0.0) + best
+  return results, totals
+
+
+def compare(results, baseline, tolerance=0.1):
+  """
+  Returns (name, baseline throughput, throughput, ratio, regressed) for each benchmark in both
+  runs. A benchmark has regressed when its throughput fell by more than tolerance.
+  """
+  before = {result['name']: result['throughput'] for result in baseline['results']}
+  comparison = []
+  for result in results:
+    old, new = before.get(result['name']), result['throughput']
+    if old and new:
+      ratio = new / old
+      comparison.append((result['name'], old, new, ratio, ratio < 1 - tolerance))
+  return comparison
+
+
+def main(scale, seed, repeat, tools, data, output, baseline, tolerance):
+  directory = data or mkdtemp()
+  try:
+    paths = generate(directory, scale, seed)
+    results, totals = run(paths, repeat, tools)
+  finally:
+    if not data:
+      rmtree(directory)
+
+  report = {
+    'scale': scale,
+    'seed': seed,
+    'repeat': repeat,
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'results': results,
+    'tools': totals,
+  }
+  if output:
+    with open(output, 'w') as f:
+      json.dump(report, f, indent=2, sort_keys=True)
+  else:
+    print json.dumps(report, indent=2, sort_keys=True)
+
+  if baseline:
+    with open(baseline) as f:
+      comparison = compare(results, json.load(f), tolerance)
+    sys.stderr.write("%-32s %14s %14s %8s\n" % ("items/s", "baseline", "current", "ratio"))
+    for name, old, new, ratio, regressed in comparison:
+      sys.stderr.write("%-32s %14.0f %14.0f %7.2fx%s\n" % (name, old, new, ratio, "  REGRESSED" if regressed else ""))
+    return 1 if any(regressed for _, _, _, _, regressed in comparison) else 0
+  return 0
+
+if __name__ == '__main__':
+  parser = ArgumentParser()
+  parser.add_argument('--scale', help="Number of symbols and holdings to generate", type=int, default=10000)
+  parser.add_argument('--seed', help="Random seed for the generated inputs", type=int, default=0)
+  parser.add_argument('--repeat', help="Timed runs per benchmark; the best is reported", type=int, default=3)
+  parser.add_argument('--tools', help="Only benchmark these tools", nargs='+', choices=['problem1', 'problem2', 'problem3'])
+  parser.add_argument('--data', help="Directory to generate the inputs in and keep them (default: a temporary one)")
+  parser.add_argument('--output', help="File to write the JSON results to (default: stdout)")
+  parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+  parser.add_argument('--tolerance', help="Throughput drop that counts as a regression", type=float, default=0.1)
+  args = parser.parse_args()
+
+  try:
+    setlocale(LC_ALL, 'en_US.UTF-8')
+  except Error:
+    pass
+  sys.exit(main(args.scale, args.seed, args.repeat, args.tools, args.data, args.output, args.baseline, args.tolerance))
@@ -0,0 +1,226 @@
+"""
+Shared loading for the key=value config files audited by problem1.py (gateway risks) and
+problem2.py (transports): typed records, and a cache of them keyed by path, modification time
+and size so that repeated audits only re-parse the files that changed.
+"""
+import cPickle as pickle
+import mmap
+import os
+import re
+from array import array
+from collections import namedtuple
+from itertools import izip
+
+GATEWAY_RISK_KEY = re.compile(r'([^_.=\s]+)_([^.=\s]+)\.gateway_risk=')
+GATEWAY_RISK = re.compile(r'(\S+) +(-?\d+) +(-?\d+)')
+# Up to 1024 consecutive risk triples, split in one step, so no line is ever held whole
+GATEWAY_RISK_BLOCK = re.compile(r'(?:\S+ +-?\d+ +-?\d+(?: +|$)){1,1024}')
+TRANSPORT = re.compile(r'=(\d+) +;(\S+)')
+
+GatewayRisk = namedtuple('GatewayRisk', 'exchange group symbol limit1 limit2')
+Transport = namedtuple('Transport', 'line ip port')
+
+
+def _gateway_risk_lines(filename):
+  """
+  Yields (exchange, group, mapped file, start, end) for each gateway risk line of a fileB-style
+  file, where the line's risk triples lie between start and end of the mapped file.
+  """
+  with open(filename, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    if not size:
+      return
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      position = 0
+      while position < size:
+        end = mapped.find('\n', position)
+        if end < 0:
+          end = size
+        key = GATEWAY_RISK_KEY.match(mapped, position, end)
+        if key:
+          exchange, group = key.groups()
+          yield exchange, group, mapped, key.end(), end
+        position = end + 1
+    finally:
+      mapped.close()
+
+
+def parse_gateway_risks(filename):
+  """
+  Yields a {@link GatewayRisk} for each risk triple in a fileB-style file.
+
+  The file is scanned through mmap with compiled patterns, one triple at a time, so even lines
+  with hundreds of thousands of triples are never copied, split or held in memory whole.
+  """
+  for exchange, group, mapped, start, end in _gateway_risk_lines(filename):
+    for risk in GATEWAY_RISK.finditer(mapped, start, end):
+      symbol, limit1, limit2 = risk.groups()
+      yield GatewayRisk(exchange, group, symbol, int(limit1), int(limit2))
+
+
+def load_gateway_limits(filename):
+  """
+  Returns the gateway risk limits of a fileB-style file grouped by (exchange, group) as compact
+  columns: limits[(exchange, group)] => (symbols, array of limit1, array of limit2).
+
+  Each mapped line is scanned in blocks of triples rather than one triple at a time, and the
+  limits go straight into array('l') columns, so neither a record per triple nor a whole line's
+  tokens are ever built.
+  """
+  limits = {}
+  for exchange, group, mapped, start, end in _gateway_risk_lines(filename):
+    symbols, limits1, limits2 = limits.setdefault((exchange, group), ([], array('l'), array('l')))
+    for block in GATEWAY_RISK_BLOCK.finditer(mapped, start, end):
+      risks = block.group().split()
+      symbols.extend(risks[0::3])
+      limits1.extend(map(int, risks[1::3]))
+      limits2.extend(map(int, risks[2::3]))
+  return limits
+
+# The shape of load_gateway_limits' results, for ConfigCache; bump it whenever they change
+load_gateway_limits.format = 1
+
+
+def parse_transports(filename):
+  """
+  Yields a {@link Transport} (line number, ip, actual port) for each transport line in a
+  fileC-style file.
+  """
+  with open(filename) as f:
+    for number, line in enumerate(f, 1):
+      match = TRANSPORT.search(line)
+      if match:
+        yield Transport(number, match.group(2), int(match.group(1)))
+
+
+class ConfigCache(object):
+  """
+  Results of parsing config files, such as lists of records, kept in memory and, given a path,
+  in a pickle file between runs. Each result is keyed by the parse function's name and the
+  file's path, and reused while the file's modification time and size and the function's
+  format are unchanged. A parse function's format attribute (0 if it has none) must be bumped
+  whenever what it returns changes, so results cached by older code are parsed again. A parse
+  function may also have a cacheable attribute, a predicate on its results: results it rejects,
+  such as ones reporting that the file could not be read, are used once but never reused or
+  saved. Results for files that no longer exist are dropped when the cache is saved.
+
+  Results loaded from the file stay pickled until they are first used, so a run that only
+  needs a few of them does not pay to unpickle the rest.
+  """
+
+  VERSION = 2
+
+  def __init__(self, path=None):
+    self.path = path
+    self.entries = {}
+    self.hits = 0
+    self.misses = 0
+    self._dirty = False
+    if path and os.path.exists(path):
+      self.entries = self._read(path)
+
+  @staticmethod
+  def signature(filename, parse):
+    status = os.stat(filename)
+    return status.st_mtime, status.st_size, getattr(parse, 'format', 0)
+
+  @staticmethod
+  def key(filename, parse):
+    return parse.__name__, os.path.abspath(filename)
+
+  def load(self, filename, parse):
+    """
+    Returns parse(filename), calling it only if the file changed since its result was cached.
+    """
+    self.refresh([filename], parse)
+    return self.cached(filename, parse)
+
+  def cached(self, filename, parse):
+    """
+    Returns the last result of parse(filename), without checking whether the file has changed.
+    """
+    entry = self.entries[self.key(filename, parse)]
+    if entry.pickled is not None:
+      entry.value, entry.pickled = pickle.loads(entry.pickled), None
+    return entry.value
+
+  def refresh(self, filenames, parse, map=map):
+    """
+    Re-parses those of filenames whose results are missing or stale. parse is called through
+    map, so passing a Pool's map (and a top-level parse function) parses them in parallel.
+    """
+    stale = []
+    for filename in filenames:
+      signature = self.signature(filename, parse)
+      entry = self.entries.get(self.key(filename, parse))
+      if entry and entry.signature == signature:
+        self.hits += 1
+      else:
+        self.misses += 1
+        stale.append((filename, signature))
+    if stale:
+      cacheable = getattr(parse, 'cacheable', None)
+      for (filename, signature), value in izip(stale, map(parse, [filename for filename, _ in stale])):
+        if cacheable and not cacheable(value):
+          # Never matches a file's signature, so it is parsed again next time
+          signature = None
+        self.entries[self.key(filename, parse)] = _Entry(signature, value)
+      self._dirty = True
+
+  def save(self):
+    """
+    Atomically writes the cache to its path, if it has one and anything was re-parsed or
+    dropped.
+    """
+    if not self.path:
+      return
+    missing = [key for key in self.entries if not os.path.exists(key[1])]
+    for key in missing:
+      del self.entries[key]
+    if not self._dirty and not missing:
+      return
+    entries = {key: (entry.signature, entry.pickle()) for key, entry in self.entries.iteritems()
+               if entry.signature is not None}
+    temporary = self.path + '.tmp'
+    try:
+      with open(temporary, 'wb') as f:
+        pickle.dump((self.VERSION, entries), f, pickle.HIGHEST_PROTOCOL)
+      os.rename(temporary, self.path)
+    except:
+      if os.path.exists(temporary):
+        os.remove(temporary)
+      raise
+    self._dirty = False
+
+  def _read(self, path):
+    """
+    Returns the entries saved at path, or none if it is unreadable or from another version.
+    """
+    try:
+      with open(path, 'rb') as f:
+        version, entries = pickle.load(f)
+    except Exception:
+      return {}
+    if version != self.VERSION:
+      return {}
+    return {key: _Entry(signature, pickled=pickled) for key, (signature, pickled) in entries.iteritems()}
+
+  def __repr__(self):
+    return "ConfigCache<files=%d, hits=%d, misses=%d>" % (len(self.entries), self.hits, self.misses)
+
+
+class _Entry(object):
+  """
+  A cached result, held either as the value itself or as the pickled string it was read as.
+  """
+
+  __slots__ = ('signature', 'value', 'pickled')
+
+  def __init__(self, signature, value=None, pickled=None):
+    self.signature = signature
+    self.value = value
+    self.pickled = pickled
+
+  def pickle(self):
+    return self.pickled if self.pickled is not None else pickle.dumps(self.value, pickle.HIGHEST_PROTOCOL)
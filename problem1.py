@@ -2,17 +2,26 @@
 """
 Given a list of symbols and gateway risks, determines which symbols are not
 found in the gateway risks for exchangeB-groupA and exchangeC-groupA.
+
+Pass --group exchange_group (repeatable) to check other groups, and --any to report
+symbols missing from at least one of the groups rather than from all of them. Pass --cache
+with a filename to keep the parsed gateway risks there and only re-parse fileB.txt when it changes.
 """
+from argparse import ArgumentParser
+
+from configs import ConfigCache, load_gateway_limits, parse_gateway_risks
+
+DEFAULT_GROUPS = [('exchangeB', 'groupA'), ('exchangeC', 'groupA')]
 
-def main(symbols, exchanges):
+
+def main(symbols, index, groups=DEFAULT_GROUPS, missing_from_any=False):
   """
-  Finds all symbols which are not in exchangeB-groupA or in exchangeC-groupA
+  Finds all symbols which are not in exchangeB-groupA or in exchangeC-groupA (or in any of
+  the given groups; with missing_from_any, which are not in every one of them)
   """
-  gateway_risks = parse_exchanges(exchanges)
-  for symbol in symbols:
-    if symbol not in gateway_risks[('exchangeB', 'groupA')] and \
-        symbol not in gateway_risks[('exchangeC', 'groupA')]:
-      print symbol
+  query = index.missing_from_any if missing_from_any else index.missing_from_all
+  for symbol in query(symbols, groups):
+    print symbol
 
 def parse_exchanges(exchanges):
   """
@@ -29,7 +38,73 @@ def parse_exchanges(exchanges):
     gateway_risks[(exchange, group)] = symbols_risk
   return gateway_risks
 
+def iter_gateway_risks(filename):
+  """
+  Yields (exchange, group, symbol, limit1, limit2) for each risk triple in a fileB-style file;
+  see {@link configs#parse_gateway_risks}.
+  """
+  return parse_gateway_risks(filename)
+
+
+class GatewayRiskIndex(object):
+  """
+  Inverted index of gateway risk configs: each symbol maps to the set of (exchange, group)
+  pairs that carry risk limits for it. Answers membership queries over any groups with set
+  operations, checking each candidate symbol once.
+  """
+
+  NO_GROUPS = frozenset()
+
+  def __init__(self, limits=None):
+    self.groups_by_symbol = {}
+    self.groups = set()
+    self.limits = limits or {}
+    for (exchange, group), (symbols, _, _) in self.limits.iteritems():
+      self.add(exchange, group, symbols)
+
+  @classmethod
+  def load(cls, filename, cache=None):
+    """
+    Builds an index straight from a fileB-style file's limit columns; see
+    {@link configs#load_gateway_limits}. With a {@link ConfigCache}, the file is only parsed if
+    it changed since it was cached.
+    """
+    return cls(cache.load(filename, load_gateway_limits) if cache else load_gateway_limits(filename))
+
+  def add(self, exchange, group, symbols):
+    key = (exchange, group)
+    self.groups.add(key)
+    for symbol in symbols:
+      self.groups_by_symbol.setdefault(symbol, set()).add(key)
+
+  def groups_for(self, symbol):
+    return self.groups_by_symbol.get(symbol, self.NO_GROUPS)
+
+  def missing_from_all(self, symbols, groups):
+    """
+    Returns the symbols, in order, that none of the groups carry.
+    """
+    groups = frozenset(groups)
+    return [s for s in symbols if self.groups_for(s).isdisjoint(groups)]
+
+  def missing_from_any(self, symbols, groups):
+    """
+    Returns the symbols, in order, that at least one of the groups does not carry.
+    """
+    groups = frozenset(groups)
+    return [s for s in symbols if not groups <= self.groups_for(s)]
+
+
 if __name__ == '__main__':
-  symbols = [line.rstrip() for line in open('fileA.txt').readlines()]
-  exchanges = [line.rstrip() for line in open('fileB.txt').readlines()]
-  main(symbols, exchanges)
+  parser = ArgumentParser()
+  parser.add_argument('--group', dest='groups', help="exchange_group to check, e.g. exchangeB_groupA", action='append',
+                      type=lambda g: tuple(g.split('_')))
+  parser.add_argument('--any', dest='missing_from_any', help="Report symbols missing from any of the groups", action='store_true')
+  parser.add_argument('--cache', help="File to cache parsed gateway risks in between runs")
+  args = parser.parse_args()
+
+  cache = ConfigCache(args.cache) if args.cache else None
+  symbols = [line.rstrip() for line in open('fileA.txt')]
+  main(symbols, GatewayRiskIndex.load('fileB.txt', cache), args.groups or DEFAULT_GROUPS, args.missing_from_any)
+  if cache:
+    cache.save()
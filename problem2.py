@@ -1,25 +1,192 @@
 #!/usr/bin/env python
 """
 Simple tool to check whether the network port follows our port numbering standard for each exchange.
+
+Pass any number of config files or directories to audit them all across --workers processes;
+mismatches are reported together as file:line ip expected port, found port, along with any
+malformed addresses or unreadable files. Pass --cache with a filename to keep each file's
+findings there, so later audits only re-check changed files.
 """
+import os
+from argparse import ArgumentParser
+from collections import namedtuple
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+from configs import ConfigCache, parse_transports
+
+Finding = namedtuple('Finding', 'filename line ip expected_port actual_port error')
+
+
 def calculate_port(ip):
-  w, x, y, z = ip.split('.')
-  return 50000 + 200 * int(y) + int(z)
+  """
+  Returns the standard port for a dotted-quad IPv4 address, raising ValueError for anything
+  else (including shorthand forms such as 10.1 that inet_aton would accept).
+  """
+  octets = ip.split('.')
+  if len(octets) != 4 or not all(octet.isdigit() and int(octet) <= 255 for octet in octets):
+    raise ValueError("Not a dotted-quad IPv4 address: %r" % ip)
+  return 50000 + 200 * int(octets[2]) + int(octets[3])
+
+
+def calculate_ports(ips):
+  """
+  Returns a list of the expected port for each ip in a sequence, computing each distinct ip
+  only once with {@link #calculate_port}.
+  """
+  ports = {}
+  return [ports[ip] if ip in ports else ports.setdefault(ip, calculate_port(ip)) for ip in ips]
 
 
 def extract_address_and_port(filename):
-  lines = [line.rstrip() for line in open(filename).readlines()]
-  for line in lines:
-    details = line.split('=')[1]
-    actual_port, ip = details.split(' ')[0:2]
-    yield ip[1:], int(actual_port)
+  for _, ip, actual_port in extract_transports(filename):
+    yield ip, actual_port
+
+
+def extract_transports(filename):
+  """
+  Streams (line number, ip, actual port) for each transport line in the file; see
+  {@link configs#parse_transports}.
+  """
+  return parse_transports(filename)
+
+
+def find_mismatches(filename, chunk_size=65536):
+  """
+  Returns a {@link Finding} for each nonstandard port in the file. Lines are checked in chunks
+  with {@link #calculate_ports}.
+
+  Problems are reported as findings with an error rather than raised: an address the port
+  cannot be computed for, or a file that cannot be read, which ends its check early.
+  """
+  findings = []
+  try:
+    transports = extract_transports(filename)
+    chunk = list(islice(transports, chunk_size))
+    while chunk:
+      findings.extend(_check_chunk(filename, chunk))
+      chunk = list(islice(transports, chunk_size))
+  except EnvironmentError as e:
+    findings.append(Finding(filename, None, None, None, None, str(e)))
+  return findings
+
+
+# The shape of find_mismatches' results, for ConfigCache; bump it whenever they change
+find_mismatches.format = 1
+
+
+def _was_read(findings):
+  """
+  Whether findings are the file's own, rather than a report that it could not be read; only
+  those are cached, since fixing a file's permissions changes neither its mtime nor its size.
+  """
+  return all(finding.line is not None for finding in findings)
 
+find_mismatches.cacheable = _was_read
 
-def main(filename):
-  for ip, actual_port in extract_address_and_port(filename):
-    expected_port = calculate_port(ip)
-    if actual_port != expected_port:
-      print "%s expected %s, found %s" % (ip, expected_port, actual_port)
+
+def _check_chunk(filename, chunk):
+  numbers, ips, actual_ports = zip(*chunk)
+  try:
+    expected_ports = calculate_ports(ips)
+  except ValueError:
+    # Some address is malformed: check this chunk line by line to report which
+    return _check_lines(filename, chunk)
+  return [Finding(filename, numbers[i], ips[i], expected_ports[i], actual_ports[i], None)
+          for i, port in enumerate(actual_ports) if port != expected_ports[i]]
+
+
+def _check_lines(filename, transports):
+  findings = []
+  for number, ip, actual_port in transports:
+    try:
+      expected_port = calculate_port(ip)
+    except ValueError as e:
+      findings.append(Finding(filename, number, ip, None, actual_port, str(e)))
+      continue
+    if expected_port != actual_port:
+      findings.append(Finding(filename, number, ip, expected_port, actual_port, None))
+  return findings
+
+
+def describe(finding):
+  if finding.error:
+    return finding.error
+  return "%s expected %s, found %s" % (finding.ip, finding.expected_port, finding.actual_port)
+
+
+def config_files(paths):
+  """
+  Expands directories (recursively) into the files beneath them, in a stable order.
+  """
+  for path in paths:
+    if os.path.isdir(path):
+      for directory, subdirectories, filenames in os.walk(path):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+          yield os.path.join(directory, filename)
+    else:
+      yield path
+
+
+def audit(paths, workers=None, cache=None):
+  """
+  Checks every file under paths, spreading the files across worker processes, and returns
+  all {@link Finding}s in file order. A malformed line or unreadable file is reported as a
+  finding and does not stop the rest of the audit.
+
+  With a {@link ConfigCache}, each file's mismatches are cached, and only the files that
+  changed since are checked again.
+  """
+  files = list(config_files(paths))
+  workers = min(workers or cpu_count(), len(files))
+  if cache:
+    # A file that cannot be stat'ed cannot be cached; checking it directly reports why
+    cached = set(filename for filename in files if os.path.exists(filename))
+    check = lambda run: cache.refresh([filename for filename in files if filename in cached], find_mismatches, run)
+  else:
+    check = lambda run: run(find_mismatches, files)
+  if workers <= 1:
+    results = check(map)
+  else:
+    pool = Pool(workers)
+    try:
+      results = check(lambda function, items: pool.map(function, items, chunksize=max(1, len(items) // (4 * workers))))
+      pool.close()
+    except:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+  if cache:
+    # Cached under their absolute path; report them under the path they were found by this time
+    results = [[finding._replace(filename=filename) for finding in cache.cached(filename, find_mismatches)]
+               if filename in cached else find_mismatches(filename) for filename in files]
+  return [finding for findings in results for finding in findings]
+
+
+def main(filename, cache=None):
+  findings = cache.load(filename, find_mismatches) if cache else find_mismatches(filename)
+  for finding in findings:
+    print describe(finding)
+
+
+def bulk_main(paths, workers=None, cache=None):
+  for finding in audit(paths, workers, cache):
+    location = finding.filename if finding.line is None else "%s:%d" % (finding.filename, finding.line)
+    print "%s %s" % (location, describe(finding))
 
 if __name__ == '__main__':
-  main('fileC.txt')
+  parser = ArgumentParser()
+  parser.add_argument('paths', help="Config files or directories to audit (defaults to fileC.txt)", nargs='*')
+  parser.add_argument('--workers', help="Number of worker processes", type=int)
+  parser.add_argument('--cache', help="File to cache each config file's mismatches in between runs")
+  args = parser.parse_args()
+
+  cache = ConfigCache(args.cache) if args.cache else None
+  if args.paths:
+    bulk_main(args.paths, args.workers, cache)
+  else:
+    main('fileC.txt', cache)
+  if cache:
+    cache.save()
@@ -9,50 +9,219 @@ Positional Arguments:
   portfolio-file FILENAME  defaults to 'portfolio.csv'
   actions-file FILENAME  defaults to 'corporate_actions.csv'
 
+Pass --stream for actions files that are already in date order; each day is applied
+as soon as it has been read instead of loading and sorting the whole file first.
+Pass --columnar to simulate on NumPy arrays (requires numpy). Either way, actions for
+symbols the portfolio has never held are skipped without being parsed, and days with no
+other actions are not reported.
+
+Pass --batch with a directory or glob of portfolio files to simulate each of them against
+the actions file across --workers processes, writing one report per portfolio to --output-dir.
+
+Pass --checkpoint with a snapshot filename to save the portfolio every --checkpoint-every
+days and, on the next run, resume after the last snapshot instead of from the initial
+portfolio. Only actions appended since then are applied; the actions file must be in date order.
+
+Pass --rates with a From,To,Rate CSV file to convert currencies with rates loaded from it
+and refreshed in the background every --rates-ttl seconds. Pass --historical-rates with a
+Day,From,To,Rate CSV file of daily rates to convert at the rates in effect on each action's date;
+the initial portfolio is valued at the earliest rates in the file.
+
+Pass --changes-only to print only the holdings each day's actions touched, and --binary-output
+with a filename to write each day's portfolio there in a compact binary format instead.
+
+Pass --feed to apply actions as a vendor publishes them rather than from a finished file:
+newline-delimited CSV rows, header first, from stdin (-), a unix:PATH or tcp:HOST:PORT socket,
+a named pipe, or a file that is followed as it grows. The portfolio's value is printed after
+each batch. At most --feed-pending records are queued before the feed stops reading, and a
+record waits at most --feed-latency seconds before it is applied. python -m problem3.feed
+replays an actions file into a feed socket.
+
+Pass --scenarios with a JSON file of what-if variants (reinvest flags for all or some holdings,
+overridden currency rates) to replay the actions once under all of them side by side and
+print a comparison of their values after each day (requires numpy). See
+problem3/scenarios.py for the format.
+
+Pass --profile to print, to stderr, the time spent reading, parsing, updating, converting and
+serializing, per action type latencies, each day's time and, every 100th day, the change in
+its object count. Pass --cprofile with a filename to also save cProfile statistics for the replay.
+
 See the committed files for format examples.
 """
+import io
+import sys
 from argparse import ArgumentParser, FileType
 from locale import setlocale, LC_ALL
 
 from problem3.actions import CurrencyConverter
-from problem3.serializers import CsvPortfolioSerializer, CsvActionsSerializer, ActionParser
+from problem3.batch import portfolio_paths, run_batch
+from problem3.checkpoints import Checkpoints
+from problem3.feed import LiveFeed, open_source
+from problem3.instrumentation import InstrumentedActionsSimulator, InstrumentedCurrencyConverter, InstrumentedDays, \
+  InstrumentedParser, NullStats, Stats
+from problem3.models import group_by_day
+from problem3.rates import CachingCurrencyConverter, FileRateProvider, HistoricalCurrencyConverter, HistoricalRateStore
+from problem3.serializers import CsvPortfolioSerializer, CsvActionsSerializer, CachingActionParser, BinaryPortfolioSerializer
+from problem3.simulator import ActionsSimulator
 
 setlocale(LC_ALL, 'en_US.UTF-8')
 
 
-class ActionsSimulator(object):
-
-  def __init__(self, parser):
-    self.parser = parser
-
-  def apply(self, action, portfolio):
-    self.parser.parse(action.description).update(portfolio.holdings[action.symbol], portfolio)
-
-
-def main(portfolio_file, actions_file, reinvest_dividends):
+def main(portfolio_file, actions_file, reinvest_dividends, stream=False, columnar=False, checkpoint=None, checkpoint_every=10,
+         rates=None, rates_ttl=300.0, historical_rates=None, changes_only=False, binary_output=None, stats=None):
   serializer = CsvPortfolioSerializer
-  converter = CurrencyConverter()
-  portfolio = serializer.deserialize(portfolio_file, converter, reinvest_dividends)
-  actions = CsvActionsSerializer.deserialize(actions_file)
-  simulator = ActionsSimulator(ActionParser())
+  stats = stats or NullStats()
+  if rates:
+    rate_cache = converter = CachingCurrencyConverter(FileRateProvider(rates), rates_ttl).start()
+  elif historical_rates:
+    converter = HistoricalCurrencyConverter(HistoricalRateStore.load(historical_rates))
+  else:
+    converter = CurrencyConverter()
+  if stats.enabled:
+    converter = InstrumentedCurrencyConverter(converter, stats)
+  checkpoints = snapshot = None
+  with stats.phase('load portfolio'):
+    if checkpoint:
+      checkpoints = Checkpoints(checkpoint, checkpoint_every)
+      snapshot = checkpoints.load(converter)
+    if snapshot:
+      portfolio = snapshot.portfolio
+    else:
+      portfolio = serializer.deserialize(portfolio_file, converter, reinvest_dividends)
+  with stats.phase('read actions'):
+    if checkpoints:
+      days = checkpoints.days(actions_file, snapshot, symbols=portfolio.symbols)
+    elif stream:
+      days = CsvActionsSerializer.deserialize_by_day(actions_file, symbols=portfolio.symbols)
+    else:
+      days = group_by_day(CsvActionsSerializer.deserialize(actions_file, symbols=portfolio.symbols))
+  days = stats.timed('read actions', days)
+  if columnar:
+    from problem3.columnar import ColumnarPortfolio, ColumnarActionsSimulator
+    portfolio = ColumnarPortfolio.from_portfolio(portfolio)
+    if stats.enabled:
+      simulator = InstrumentedDays(ColumnarActionsSimulator(InstrumentedParser(CachingActionParser(), stats)), stats)
+    else:
+      simulator = ColumnarActionsSimulator(CachingActionParser())
+    view = lambda p: p.to_portfolio()
+  else:
+    if stats.enabled:
+      simulator = InstrumentedActionsSimulator(CachingActionParser(), stats)
+    else:
+      simulator = ActionsSimulator(CachingActionParser())
+    view = lambda p: p
+
+  if binary_output:
+    output = io.open(binary_output, 'wb')
+    report = lambda title, changed_only: BinaryPortfolioSerializer.serialize(view(portfolio), output, changed_only)
+  else:
+    output = None
+    def report(title, changed_only):
+      print title
+      print serializer.serialize(view(portfolio), changed_only).getvalue()
+
+  if snapshot:
+    report("Portfolio resumed after %s" % snapshot.date, False)
+  else:
+    report("Initial Portfolio", False)
+
+  date = None
+  for date, actions in days:
+    portfolio.clear_changes()
+    simulator.apply_day(actions, portfolio)
+    with stats.phase('serialize'):
+      report("Portfolio after %s" % date, changes_only)
+    if checkpoints:
+      with stats.phase('checkpoint'):
+        checkpoints.completed(view(portfolio), date)
+
+  if checkpoints and date:
+    checkpoints.save(view(portfolio), date)
+  if rates:
+    rate_cache.stop()
+  if output:
+    output.close()
+
+def compare(portfolio_file, actions_file, reinvest_dividends, scenarios_file):
+  """
+  Replays the actions once under every scenario in scenarios_file, printing a comparison of
+  the scenarios after each day; see {@link ScenarioPortfolio}.
+  """
+  from problem3.columnar import ColumnarActionsSimulator
+  from problem3.scenarios import Scenario, ScenarioPortfolio, ScenarioReportSerializer
+  base = CsvPortfolioSerializer.deserialize(portfolio_file, CurrencyConverter(), reinvest_dividends)
+  portfolio = ScenarioPortfolio.from_portfolio(base, Scenario.load(scenarios_file))
+  simulator = ColumnarActionsSimulator(CachingActionParser())
 
   print "Initial Portfolio"
-  print serializer.serialize(portfolio).getvalue()
-
-  current_date = None
-  for action in actions:
-    simulator.apply(action, portfolio)
-
-    if not current_date or current_date != action.date:
-      print "Portfolio after %s" % action.date
-      print serializer.serialize(portfolio).getvalue()
-      current_date = action.date
+  print ScenarioReportSerializer.serialize(portfolio).getvalue()
+  for date, actions in group_by_day(CsvActionsSerializer.deserialize(actions_file, symbols=base.symbols)):
+    simulator.apply_day(actions, portfolio)
+    print "Scenarios after %s" % date
+    print ScenarioReportSerializer.serialize(portfolio).getvalue()
+
+def live(portfolio_file, source, reinvest_dividends, max_pending=1024, max_latency=0.5):
+  """
+  Applies actions from a live source as they arrive, printing the portfolio's value after
+  each batch; see {@link LiveFeed}.
+  """
+  portfolio = CsvPortfolioSerializer.deserialize(portfolio_file, CurrencyConverter(), reinvest_dividends)
+
+  def publish(portfolio, records, latency):
+    print "%s: %d actions applied after %.3fs, portfolio value %.2f %s" % (
+      records[-1].date, len(records), latency, portfolio.value(), portfolio.cash_currency)
+    sys.stdout.flush()
+
+  feed = LiveFeed(portfolio, ActionsSimulator(CachingActionParser()), publish, max_pending, max_latency=max_latency)
+  try:
+    feed.run(open_source(source, feed.stopped))
+  except KeyboardInterrupt:
+    feed.stop()
+  print CsvPortfolioSerializer.serialize(portfolio).getvalue()
 
 if __name__ == '__main__':
   parser = ArgumentParser()
   parser.add_argument('--portfolio', dest='portfolio_file', help="Portfolio CSV filename", default='portfolio.csv', type=FileType('r'))
   parser.add_argument('--actions', dest='actions_file', help="Actions CSV filename", default='corporate_actions.csv', type=FileType('r'))
   parser.add_argument('-r', '--reinvest-dividends', help="Simulate with reinvested dividends", action='store_true')
+  parser.add_argument('-s', '--stream', help="Apply each day as it is read; the actions file must be in date order", action='store_true')
+  parser.add_argument('-c', '--columnar', help="Simulate on NumPy arrays", action='store_true')
+  parser.add_argument('--batch', help="Directory or glob of portfolio CSV files to simulate in parallel")
+  parser.add_argument('--output-dir', help="Directory for --batch reports", default='output')
+  parser.add_argument('--workers', help="Number of --batch worker processes", type=int)
+  parser.add_argument('--checkpoint', help="Snapshot filename to resume from and save to")
+  parser.add_argument('--checkpoint-every', help="Days between snapshots", type=int, default=10)
+  parser.add_argument('--rates', help="Currency rates CSV filename (From,To,Rate)")
+  parser.add_argument('--rates-ttl', help="Seconds between currency rate refreshes", type=float, default=300.0)
+  parser.add_argument('--historical-rates', help="Daily currency rates CSV filename (Day,From,To,Rate)", type=FileType('r'))
+  parser.add_argument('-d', '--changes-only', help="Print only the holdings changed each day", action='store_true')
+  parser.add_argument('--binary-output', help="Write each day's portfolio to this file in binary instead of printing it")
+  parser.add_argument('--scenarios', help="JSON file of scenarios to replay side by side and compare", type=FileType('r'))
+  parser.add_argument('--feed', help="Apply actions live from -, unix:PATH, tcp:HOST:PORT, a named pipe or a growing file")
+  parser.add_argument('--feed-pending', help="Records to queue before the feed pushes back", type=int, default=1024)
+  parser.add_argument('--feed-latency', help="Seconds a record may wait before its batch is applied", type=float, default=0.5)
+  parser.add_argument('--profile', help="Print where the replay spent its time to stderr", action='store_true')
+  parser.add_argument('--cprofile', help="Also write cProfile statistics for the replay to this file")
   args = parser.parse_args()
 
-  main(args.portfolio_file, args.actions_file, args.reinvest_dividends)
+  if args.scenarios:
+    compare(args.portfolio_file, args.actions_file, args.reinvest_dividends, args.scenarios)
+  elif args.feed:
+    live(args.portfolio_file, args.feed, args.reinvest_dividends, args.feed_pending, args.feed_latency)
+  elif args.batch:
+    for report in run_batch(portfolio_paths(args.batch), args.actions_file, args.output_dir, args.workers, args.reinvest_dividends):
+      print report
+  else:
+    stats = Stats() if args.profile else None
+    replay = lambda: main(args.portfolio_file, args.actions_file, args.reinvest_dividends, args.stream, args.columnar,
+                          args.checkpoint, args.checkpoint_every, args.rates, args.rates_ttl,
+                          args.historical_rates, args.changes_only, args.binary_output, stats)
+    if args.cprofile:
+      import cProfile
+      profiler = cProfile.Profile()
+      profiler.runcall(replay)
+      profiler.dump_stats(args.cprofile)
+    else:
+      replay()
+    if stats:
+      sys.stderr.write(stats.report())
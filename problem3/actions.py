@@ -1,13 +1,29 @@
+from itertools import izip
 from locale import format
+from problem3.models import intern_string
 
 
 class Action(object):
+  """
+  Actions are immutable values, compared field by field over their __slots__.
+  """
+
+  __slots__ = ()
 
   def update(self, holding, portfolio):
     raise Exception("Must be implemented")
 
+  def _fields(self):
+    return tuple(getattr(self, name) for name in self.__slots__)
+
   def __eq__(self, other):
-      return self.__dict__ == other.__dict__
+      return type(self) is type(other) and self._fields() == other._fields()
+
+  def __ne__(self, other):
+      return not self == other
+
+  def __hash__(self):
+      return hash((type(self), self._fields()))
 
 
 class CashDividendAction(Action):
@@ -15,23 +31,27 @@ class CashDividendAction(Action):
   Handles cash dividends. Dividends may be reinvested or swept
   to a cash account. Allows for fractional share purchases.
   """
+  __slots__ = ('value', 'currency')
+
   def __init__(self, value, currency):
     self.value = value
-    self.currency = currency
+    self.currency = intern_string(currency)
 
   def update(self, holding, portfolio):
+    previous_value = holding.total_value()
     # Must adjust the share price before reinvesting dividends
     self._adjust_share_price(holding, portfolio)
     if not holding.reinvest_dividends:
       self._sweep_dividends_to_cash(holding, portfolio)
     else:
       self._reinvest_dividends(holding, portfolio)
+    portfolio.revalue(holding, previous_value)
 
   def _sweep_dividends_to_cash(self, holding, portfolio):
     """
     Sweep the dividends into the Money Market cash account, performing any necessary currency conversions.
     """
-    value = portfolio.currency_converter.convert(self.value, self.currency, portfolio.cash_currency)
+    value = portfolio.currency_converter.convert(self.value, self.currency, portfolio.cash_currency, portfolio.date)
     total_distribution = value * holding.shares
     portfolio.cash_value += total_distribution
 
@@ -40,7 +60,7 @@ class CashDividendAction(Action):
     Reinvest the dividends into the issuing stock.
     """
     # Dividends should be distributed in the holding currency, but just in case of a special distribution...
-    value = portfolio.currency_converter.convert(self.value, self.currency, holding.currency)
+    value = portfolio.currency_converter.convert(self.value, self.currency, holding.currency, portfolio.date)
     total_distribution = value * holding.shares
     shares_to_purchase = total_distribution / holding.price
     holding.shares += shares_to_purchase
@@ -49,7 +69,7 @@ class CashDividendAction(Action):
     """
     Adjust the share price downward by the amount of the dividend to reflect the reduced market cap.
     """
-    value = portfolio.currency_converter.convert(self.value, self.currency, holding.currency)
+    value = portfolio.currency_converter.convert(self.value, self.currency, holding.currency, portfolio.date)
     holding.price -= value
 
   def __repr__(self):
@@ -62,14 +82,18 @@ class StockSplitAction(Action):
   not affect proportional ownership in the company; the share price adjusts to compensate for
   the change in the number of shares owned.
   """
+  __slots__ = ('before', 'after')
+
   def __init__(self, before, after):
     self.before = before
     self.after = after
 
   def update(self, holding, portfolio):
+    previous_value = holding.total_value()
     multiple = self.after / float(self.before) # ex: 9 for 10 => if I had 10 shares I now have 9. multiple = 9/10 = 0.9
     holding.shares *= multiple
     holding.price /= multiple
+    portfolio.revalue(holding, previous_value)
 
   def __repr__(self):
     return "%d for %d" % (self.after, self.before)
@@ -82,12 +106,16 @@ class StockDividendAction(Action):
   the change in the number of shares owned.
   """
 
+  __slots__ = ('amount',)
+
   def __init__(self, amount):
     self.amount = amount
 
   def update(self, holding, portfolio):
+    previous_value = holding.total_value()
     holding.shares *= self.amount
     holding.price /= self.amount
+    portfolio.revalue(holding, previous_value)
 
   def __repr__(self):
     return "%0.3f/share" % self.amount
@@ -97,11 +125,14 @@ class NameChangeAction(Action):
   """
   Updates a company's stock name.
   """
+  __slots__ = ('new_name',)
+
   def __init__(self, new_name):
     self.new_name = new_name
 
   def update(self, holding, portfolio):
     holding.description = self.new_name
+    portfolio.mark_changed(holding)
 
   def __repr__(self):
     return "new name is \"%s\"" % self.new_name
@@ -111,13 +142,13 @@ class SymbolChangeAction(Action):
   """
   Updates a company's stock symbol.
   """
+  __slots__ = ('new_symbol',)
+
   def __init__(self, new_symbol):
-    self.new_symbol = new_symbol
+    self.new_symbol = intern_string(new_symbol)
 
   def update(self, holding, portfolio):
-    del portfolio.holdings[holding.symbol]
-    portfolio.holdings[self.new_symbol] = holding
-    holding.symbol = self.new_symbol
+    portfolio.rename(holding, self.new_symbol)
 
   def __repr__(self):
     return "new symbol is %s" % self.new_symbol
@@ -127,6 +158,8 @@ class CurrencyConverter(object):
   """
   Static currency conversions between USD, CAD, and GBP. In real life, this would
   be replaced with a (cached, periodically refreshed?) call to an external service.
+
+  Converters take the date the conversion is for; static rates ignore it.
   """
 
   CONVERSION_TABLE = {
@@ -137,5 +170,21 @@ class CurrencyConverter(object):
   }
 
   @classmethod
-  def convert(cls, value, from_currency, to_currency):
+  def convert(cls, value, from_currency, to_currency, date=None):
     return value * cls.CONVERSION_TABLE[(from_currency, to_currency)]
+
+  @classmethod
+  def convert_many(cls, values, from_currencies, to_currency, date=None):
+    return convert_many(cls.CONVERSION_TABLE, values, from_currencies, to_currency)
+
+
+def convert_many(rates, values, from_currencies, to_currency):
+  """
+  Converts a sequence of values with one rate table. from_currencies is either one currency
+  for every value or a parallel sequence of currencies.
+  """
+  if isinstance(from_currencies, basestring):
+    rate = rates[(from_currencies, to_currency)]
+    return [value * rate for value in values]
+  return [value * rates[(currency, to_currency)] for value, currency in izip(values, from_currencies)]
+
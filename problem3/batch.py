@@ -0,0 +1,93 @@
+import os
+from glob import glob
+from multiprocessing import Pool, cpu_count
+
+from problem3.actions import CurrencyConverter
+from problem3.models import group_by_day
+from problem3.serializers import CsvPortfolioSerializer, CsvActionsSerializer, CachingActionParser
+from problem3.simulator import ActionsSimulator
+
+# Parsed actions shared by every task in a worker process; see {@link #run_batch}
+_days = None
+
+
+def parse_actions(actions_file, parser=None):
+  """
+  Reads and parses an actions file once into [(date, [(symbol, action), ...]), ...].
+  """
+  parser = parser or CachingActionParser()
+  return [(date, [(record.symbol, parser.parse(record.description)) for record in records])
+          for date, records in group_by_day(CsvActionsSerializer.deserialize(actions_file))]
+
+
+def portfolio_paths(pattern):
+  """
+  Expands a directory (every *.csv in it) or a glob pattern into a sorted list of portfolio files.
+  """
+  if os.path.isdir(pattern):
+    pattern = os.path.join(pattern, '*.csv')
+  return sorted(glob(pattern))
+
+
+def output_path(portfolio_path, output_dir):
+  return os.path.join(output_dir, os.path.splitext(os.path.basename(portfolio_path))[0] + '.txt')
+
+
+def simulate(portfolio_path, output_file, days, reinvest_dividends=False):
+  """
+  Simulates pre-parsed days against one portfolio file, writing the same report problem3.py prints.
+  The days are shared by every portfolio, so each one skips the actions for symbols it has never
+  held as it goes, and days with none of its actions are not reported.
+  """
+  serializer = CsvPortfolioSerializer
+  simulator = ActionsSimulator(None)
+  with open(portfolio_path) as portfolio_file:
+    portfolio = serializer.deserialize(portfolio_file, CurrencyConverter(), reinvest_dividends)
+  with open(output_file, 'w') as out:
+    out.write("Initial Portfolio\n%s\n" % serializer.serialize(portfolio).getvalue())
+    for date, actions in days:
+      portfolio.date = date
+      applied = False
+      for symbol, action in actions:
+        # Checked as each action is applied, since symbol changes add to the portfolio's symbols
+        if symbol in portfolio.symbols:
+          simulator.apply_parsed(symbol, action, portfolio)
+          applied = True
+      if applied:
+        out.write("Portfolio after %s\n%s\n" % (date, serializer.serialize(portfolio).getvalue()))
+  return output_file
+
+
+def run_batch(portfolio_files, actions_file, output_dir, workers=None, reinvest_dividends=False):
+  """
+  Simulates one actions file against many portfolio files across a pool of worker processes,
+  writing one report per portfolio into output_dir. Returns the report paths.
+
+  The actions are parsed once here and handed to each worker when it starts, so they are
+  inherited through fork (or pickled once per worker elsewhere) rather than sent with every task.
+  """
+  days = parse_actions(actions_file)
+  if not os.path.isdir(output_dir):
+    os.makedirs(output_dir)
+  tasks = [(path, output_path(path, output_dir), reinvest_dividends) for path in portfolio_files]
+  workers = workers or cpu_count()
+  pool = Pool(workers, initializer=_init_worker, initargs=(days,))
+  try:
+    results = pool.map(_simulate_task, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  return results
+
+
+def _init_worker(days):
+  global _days
+  _days = days
+
+
+def _simulate_task(task):
+  portfolio_path, output_file, reinvest_dividends = task
+  return simulate(portfolio_path, output_file, _days, reinvest_dividends)
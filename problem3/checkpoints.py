@@ -0,0 +1,171 @@
+import os
+import struct
+from csv import reader
+from datetime import date
+
+from problem3.models import Holding, Portfolio, SymbolIndex
+from problem3.serializers import CsvActionsSerializer
+
+
+class Snapshot(object):
+  """
+  A {@link Portfolio} as it stood after every action up to and including date had been applied.
+  offset is the byte position in the actions file where the following day starts.
+  """
+
+  def __init__(self, portfolio, date, offset):
+    self.portfolio = portfolio
+    self.date = date
+    self.offset = offset
+
+  def __repr__(self):
+    return "Snapshot<date=%s, offset=%d, holdings=%d>" % (self.date, self.offset, len(self.portfolio.holdings))
+
+
+class BinarySnapshotSerializer(object):
+  """
+  Marshalls {@link Snapshot}s to/from a compact little-endian binary format:
+
+    header:  magic, version, date ordinal, actions offset, cash value, cash currency, holding count
+    holding: symbol, description, country, currency, shares, price, reinvest flag
+    aliases: alias count, then each symbol with the position of its holding
+
+  Strings are written as a 2-byte length followed by UTF-8 bytes.
+  """
+
+  MAGIC = 'P3SNAP'
+  VERSION = 2
+  HEADER = struct.Struct('<6sHIQd')
+  NUMBERS = struct.Struct('<dd?')
+  COUNT = struct.Struct('<I')
+  LENGTH = struct.Struct('<H')
+
+  @classmethod
+  def serialize(cls, snapshot, stream):
+    portfolio = snapshot.portfolio
+    stream.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, snapshot.date.toordinal(), snapshot.offset, portfolio.cash_value))
+    cls._write_string(stream, portfolio.cash_currency)
+    ids = sorted(portfolio.holdings)
+    stream.write(cls.COUNT.pack(len(ids)))
+    for id in ids:
+      h = portfolio.holdings[id]
+      for field in (h.symbol, h.description, h.country, h.currency):
+        cls._write_string(stream, field)
+      stream.write(cls.NUMBERS.pack(h.shares, h.price, h.reinvest_dividends))
+    positions = {id: position for position, id in enumerate(ids)}
+    stream.write(cls.COUNT.pack(len(portfolio.symbols)))
+    for symbol, id in portfolio.symbols.items():
+      cls._write_string(stream, symbol)
+      stream.write(cls.COUNT.pack(positions[id]))
+
+  @classmethod
+  def deserialize(cls, stream, currency_converter):
+    magic, version, ordinal, offset, cash_value = cls.HEADER.unpack(stream.read(cls.HEADER.size))
+    if magic != cls.MAGIC or version != cls.VERSION:
+      raise ValueError("Not a version %d portfolio snapshot" % cls.VERSION)
+    cash_currency = cls._read_string(stream)
+    count, = cls.COUNT.unpack(stream.read(cls.COUNT.size))
+    holdings = []
+    for _ in xrange(count):
+      symbol, description, country, currency = [cls._read_string(stream) for _ in xrange(4)]
+      shares, price, reinvest_dividends = cls.NUMBERS.unpack(stream.read(cls.NUMBERS.size))
+      holdings.append(Holding(symbol, description, country, shares, price, currency, reinvest_dividends))
+    portfolio = Portfolio(holdings, currency_converter, cash_value, cash_currency, date.fromordinal(ordinal))
+    count, = cls.COUNT.unpack(stream.read(cls.COUNT.size))
+    portfolio.symbols = SymbolIndex((cls._read_string(stream), cls.COUNT.unpack(stream.read(cls.COUNT.size))[0])
+                                    for _ in xrange(count))
+    return Snapshot(portfolio, portfolio.date, offset)
+
+  @classmethod
+  def _write_string(cls, stream, value):
+    if isinstance(value, unicode):
+      value = value.encode('utf-8')
+    stream.write(cls.LENGTH.pack(len(value)))
+    stream.write(value)
+
+  @classmethod
+  def _read_string(cls, stream):
+    length, = cls.LENGTH.unpack(stream.read(cls.LENGTH.size))
+    return stream.read(length)
+
+
+class LineOffsetReader(object):
+  """
+  Iterates over the lines of a seekable file while tracking line_start: the byte offset where
+  the most recently read line began, or the end of the file once it is exhausted.
+  """
+
+  def __init__(self, file):
+    self.file = file
+    self.line_start = file.tell()
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    self.line_start = self.file.tell()
+    line = self.file.readline()
+    if not line:
+      raise StopIteration
+    return line
+
+
+class Checkpoints(object):
+  """
+  Snapshots a long replay every N days and resumes from the latest snapshot, so a restart only
+  reads and applies the actions after it. The actions file must be in date order and may only
+  grow by appending.
+  """
+
+  def __init__(self, path, every_days=10, serializer=BinarySnapshotSerializer):
+    self.path = path
+    self.every_days = every_days
+    self.serializer = serializer
+    self._days_since_save = 0
+    self._reader = None
+
+  def load(self, currency_converter):
+    """
+    Returns the latest {@link Snapshot}, or None if there is none yet.
+    """
+    if not os.path.exists(self.path):
+      return None
+    with open(self.path, 'rb') as stream:
+      return self.serializer.deserialize(stream, currency_converter)
+
+  def days(self, actions_file, snapshot=None, date_format="%m/%d/%Y", symbols=None):
+    """
+    Lazily yields the (date, actions) pairs that follow the snapshot, or every day without one.
+    With symbols, rows for other symbols are skipped; see {@link CsvActionsSerializer#deserialize_by_day}.
+    """
+    fieldnames = next(reader([actions_file.readline()]))
+    if snapshot:
+      actions_file.seek(0, os.SEEK_END)
+      if snapshot.offset > actions_file.tell():
+        raise ValueError("Actions file is shorter than snapshot offset %d" % snapshot.offset)
+      actions_file.seek(snapshot.offset)
+    self._reader = LineOffsetReader(actions_file)
+    for day, actions in CsvActionsSerializer.deserialize_by_day(self._reader, date_format, fieldnames, symbols):
+      if snapshot and day < snapshot.date:
+        raise ValueError("Actions for %s follow snapshot of %s" % (day, snapshot.date))
+      yield day, actions
+
+  def completed(self, portfolio, day):
+    """
+    Records that every action for day has been applied, saving a snapshot every N days.
+    """
+    self._days_since_save += 1
+    if self._days_since_save >= self.every_days:
+      self.save(portfolio, day)
+
+  def save(self, portfolio, day):
+    """
+    Atomically replaces the snapshot with the portfolio as of the end of day.
+    """
+    # While a day is being applied, the reader has read exactly one row of the next day
+    snapshot = Snapshot(portfolio, day, self._reader.line_start)
+    temporary = self.path + '.tmp'
+    with open(temporary, 'wb') as stream:
+      self.serializer.serialize(snapshot, stream)
+    os.rename(temporary, self.path)
+    self._days_since_save = 0
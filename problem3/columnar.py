@@ -0,0 +1,201 @@
+from problem3.actions import CashDividendAction, StockSplitAction, StockDividendAction, \
+  SymbolChangeAction, NameChangeAction
+from problem3.models import Holding, Portfolio, SymbolIndex
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+class ColumnarPortfolio(object):
+  """
+  A {@link Portfolio} whose shares, price, currency code and reinvest flag are stored in NumPy
+  arrays, so a whole day's splits and dividends are applied as array operations instead of one
+  {@link Holding} attribute write at a time. Row i belongs to symbols[i]; index maps each
+  symbol, current or historical, to its row.
+  """
+
+  def __init__(self, holdings, currency_converter, cash_value=0.0, cash_currency='USD', date=None):
+    if numpy is None:
+      raise ImportError("ColumnarPortfolio requires numpy")
+    holdings = list(holdings)
+    self.symbols = [h.symbol for h in holdings]
+    self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+    self.descriptions = [h.description for h in holdings]
+    self.countries = [h.country for h in holdings]
+    self.currencies = []
+    self._currency_codes = {}
+    self.currency_code(cash_currency)
+    self.currency = numpy.array([self.currency_code(h.currency) for h in holdings], dtype=numpy.intp)
+    self.shares = numpy.array([h.shares for h in holdings], dtype=numpy.float64)
+    self.price = numpy.array([h.price for h in holdings], dtype=numpy.float64)
+    self.reinvest_dividends = numpy.array([h.reinvest_dividends for h in holdings], dtype=numpy.bool_)
+    self.cash_value = cash_value
+    self.cash_currency = cash_currency
+    self.currency_converter = currency_converter
+    self.date = date
+    self.changed_rows = set()
+    self._rates = None
+    self._rates_for = None
+
+  @classmethod
+  def from_portfolio(cls, portfolio):
+    ids = sorted(portfolio.holdings)
+    columnar = cls([portfolio.holdings[id] for id in ids], portfolio.currency_converter, portfolio.cash_value,
+                   portfolio.cash_currency, portfolio.date)
+    rows = {id: row for row, id in enumerate(ids)}
+    columnar.index.update((symbol, rows[id]) for symbol, id in portfolio.symbols.items())
+    return columnar
+
+  def to_portfolio(self):
+    holdings = [Holding(self.symbols[i], self.descriptions[i], self.countries[i], self.shares[i], self.price[i],
+                        self.currencies[self.currency[i]], bool(self.reinvest_dividends[i]))
+                for i in xrange(len(self.symbols))]
+    portfolio = Portfolio(holdings, self.currency_converter, self.cash_value, self.cash_currency, self.date)
+    portfolio.symbols = SymbolIndex(self.index.items())
+    portfolio.changed.update(holdings[row] for row in self.changed_rows)
+    return portfolio
+
+  def clear_changes(self):
+    self.changed_rows.clear()
+
+  def currency_code(self, currency):
+    """
+    Returns the integer code for a currency, registering it if it has not been seen before.
+    """
+    code = self._currency_codes.get(currency)
+    if code is None:
+      code = self._currency_codes[currency] = len(self.currencies)
+      self.currencies.append(currency)
+      self._rates = None
+    return code
+
+  def rates(self):
+    """
+    Returns the conversion matrix between currency codes as of the portfolio's date: rates[from, to].
+    The matrix is rebuilt when the date changes or the converter refreshes its rates.
+    """
+    key = self.rates_key()
+    if self._rates is None or self._rates_for != key:
+      convert = self.currency_converter.convert
+      self._rates = numpy.array([[convert(1.0, f, t, self.date) for t in self.currencies] for f in self.currencies])
+      self._rates_for = key
+    return self._rates
+
+  def rates_key(self):
+    """
+    Returns what the conversion matrix depends on: the date and, for converters whose rates are
+    refreshed (see {@link CachingCurrencyConverter}), how many times they have been.
+    """
+    return self.date, getattr(self.currency_converter, 'generation', None)
+
+  def value(self):
+    to_cash = self.rates()[:, self.currency_code(self.cash_currency)]
+    return self.cash_value + numpy.dot(self.shares * self.price, to_cash[self.currency])
+
+  def apply_splits(self, rows, multiples):
+    """
+    Multiplies shares and divides prices by each multiple (after / before) in one step.
+    """
+    for r in _rounds(rows):
+      self.shares[rows[r]] *= multiples[r]
+      self.price[rows[r]] /= multiples[r]
+
+  def apply_stock_dividends(self, rows, amounts):
+    self.apply_splits(rows, amounts)
+
+  def apply_cash_dividends(self, rows, values, currencies):
+    """
+    Adjusts share prices down by each dividend, then reinvests it or sweeps it to cash
+    according to each row's reinvest flag; see {@link CashDividendAction}.
+    """
+    rates = self.rates()
+    cash_code = self.currency_code(self.cash_currency)
+    for r in _rounds(rows):
+      held, value, currency = rows[r], values[r], currencies[r]
+      distribution = value * rates[currency, self.currency[held]]
+      self.price[held] -= distribution
+      reinvest = self.reinvest_dividends[held]
+      self.cash_value += float(numpy.sum((value * rates[currency, cash_code] * self.shares[held])[~reinvest]))
+      reinvested = held[reinvest]
+      self.shares[reinvested] += distribution[reinvest] * self.shares[reinvested] / self.price[reinvested]
+
+  def rename(self, symbol, new_symbol):
+    """
+    Changes a row's ticker, keeping symbol as an alias for it.
+    """
+    row = self.index[symbol]
+    self.index[new_symbol] = row
+    self.symbols[row] = new_symbol
+
+
+class ColumnarActionsSimulator(object):
+  """
+  Applies a day's {@link ActionRecord}s to a {@link ColumnarPortfolio}, batching cash
+  dividends, stock dividends and splits into arrays, applied in that order. A batch is flushed
+  early whenever the file goes back to an earlier type, so the result matches applying every
+  action in file order. Name and symbol changes are applied as they are read; actions for
+  symbols the portfolio has never held are dropped.
+  """
+
+  def __init__(self, parser):
+    self.parser = parser
+
+  def apply_day(self, actions, portfolio):
+    cash, stock, splits = [], [], []
+    for record in actions:
+      portfolio.date = record.date
+      row = portfolio.index.get(record.symbol)
+      if row is None:
+        continue
+      action = self.parser.parse(record.description)
+      portfolio.changed_rows.add(row)
+      if isinstance(action, CashDividendAction):
+        if stock or splits:
+          self._flush(portfolio, cash, stock, splits)
+        cash.append((row, action.value, portfolio.currency_code(action.currency)))
+      elif isinstance(action, StockDividendAction):
+        if splits:
+          self._flush(portfolio, cash, stock, splits)
+        stock.append((row, action.amount))
+      elif isinstance(action, StockSplitAction):
+        splits.append((row, action.after / float(action.before)))
+      elif isinstance(action, NameChangeAction):
+        portfolio.descriptions[row] = action.new_name
+      elif isinstance(action, SymbolChangeAction):
+        portfolio.rename(record.symbol, action.new_symbol)
+      else:
+        raise ValueError("Unsupported action: %r" % record)
+    self._flush(portfolio, cash, stock, splits)
+
+  @staticmethod
+  def _flush(portfolio, cash, stock, splits):
+    """
+    Applies and empties the pending batches.
+    """
+    if cash:
+      rows, values, currencies = zip(*cash)
+      portfolio.apply_cash_dividends(numpy.array(rows), numpy.array(values), numpy.array(currencies))
+    if stock:
+      rows, amounts = zip(*stock)
+      portfolio.apply_stock_dividends(numpy.array(rows), numpy.array(amounts))
+    if splits:
+      rows, multiples = zip(*splits)
+      portfolio.apply_splits(numpy.array(rows), numpy.array(multiples))
+    del cash[:], stock[:], splits[:]
+
+
+def _rounds(rows):
+  """
+  Splits positions in rows into successive masks in which no row repeats, so that several
+  actions for one symbol on the same day are applied one after another, in order.
+  """
+  if len(numpy.unique(rows)) == len(rows):
+    return [slice(None)]
+  order = numpy.argsort(rows, kind='mergesort')
+  ordered = rows[order]
+  starts = numpy.r_[0, numpy.flatnonzero(ordered[1:] != ordered[:-1]) + 1]
+  occurrence = numpy.empty(len(rows), dtype=numpy.intp)
+  occurrence[order] = numpy.arange(len(rows)) - numpy.repeat(starts, numpy.diff(numpy.r_[starts, len(rows)]))
+  return [occurrence == n for n in xrange(occurrence.max() + 1)]
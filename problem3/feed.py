@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+"""
+Live corporate actions: applies records to a portfolio as a vendor publishes them, instead of
+replaying a finished file.
+
+Run as a module to stand in for the vendor, replaying an actions file into a feed's socket:
+
+  python -m problem3.feed ADDRESS ACTIONS_FILE [--interval SECONDS]
+
+ADDRESS is unix:PATH or tcp:HOST:PORT, as given to problem3.py --feed.
+"""
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from Queue import Queue, Empty, Full
+from argparse import ArgumentParser
+from datetime import date
+
+from problem3.serializers import CsvActionsSerializer
+
+
+def lines(file):
+  """
+  Yields the lines of a pipe or other stream as soon as each one arrives. (Iterating over a
+  file object reads ahead in large blocks, which would hold lines back.)
+  """
+  return iter(file.readline, '')
+
+
+def follow(file, stopped, poll_interval=0.1):
+  """
+  Yields the lines of a file, then waits for more to be appended (like tail -f) until stopped
+  is set. A line is only yielded once its newline has been written.
+  """
+  partial = ''
+  while True:
+    line = file.readline()
+    if line.endswith('\n'):
+      yield partial + line
+      partial = ''
+    else:
+      partial += line
+      if stopped.wait(poll_interval):
+        return
+
+
+def parse_address(address):
+  """
+  Returns the socket family and address for unix:PATH or tcp:HOST:PORT.
+  """
+  kind, _, location = address.partition(':')
+  if kind == 'unix':
+    return socket.AF_UNIX, location
+  if kind == 'tcp':
+    host, _, port = location.rpartition(':')
+    return socket.AF_INET, (host or 'localhost', int(port))
+  raise ValueError("Expected unix:PATH or tcp:HOST:PORT, not %r" % address)
+
+
+class SocketSource(object):
+  """
+  Listens on a local socket from construction, so a producer can connect straight away, and
+  yields the lines of the first connection until the producer closes it. close may be called
+  from another thread, and ends a read that is waiting on the producer.
+  """
+
+  def __init__(self, address):
+    family, self.address = parse_address(address)
+    self.listener = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET:
+      self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self.listener.bind(self.address)
+    self.listener.listen(1)
+    self.connection = None
+
+  def __iter__(self):
+    try:
+      self.connection, _ = self.listener.accept()
+      for line in lines(self.connection.makefile('rb')):
+        yield line
+    finally:
+      self.close()
+
+  def close(self):
+    if self.connection is not None:
+      try:
+        self.connection.shutdown(socket.SHUT_RDWR)
+      except socket.error:
+        pass
+      self.connection.close()
+    self.listener.close()
+    if isinstance(self.address, basestring) and os.path.exists(self.address):
+      os.remove(self.address)
+
+
+class FileSource(object):
+  """
+  Yields the lines of a stream or pipe as they arrive (see {@link #lines}) or, given stopped,
+  of a file as it grows (see {@link #follow}), and closes the file once they end. close may
+  be called from another thread while a line is being read; the file is then closed as soon
+  as that read returns.
+  """
+
+  def __init__(self, file, stopped=None, poll_interval=0.1):
+    self.file = file
+    self.stopped = stopped
+    self.poll_interval = poll_interval
+
+  def __iter__(self):
+    try:
+      for line in lines(self.file) if self.stopped is None else follow(self.file, self.stopped, self.poll_interval):
+        yield line
+    finally:
+      self.file.close()
+
+  def close(self):
+    try:
+      self.file.close()
+    except IOError:
+      # Another thread is reading; __iter__ closes the file once it stops
+      pass
+
+
+def open_source(source, stopped):
+  """
+  Returns the lines of a feed: - for stdin, unix:PATH or tcp:HOST:PORT for a socket, a named
+  pipe, or a regular file, which is followed as it grows.
+  """
+  if source == '-':
+    return FileSource(sys.stdin)
+  if source.startswith(('unix:', 'tcp:')):
+    return SocketSource(source)
+  if stat.S_ISFIFO(os.stat(source).st_mode):
+    return FileSource(open(source, 'rb'))
+  return FileSource(open(source, 'rb'), stopped)
+
+
+class LiveFeed(object):
+  """
+  Applies newline-delimited action records, in the actions CSV format and starting with its
+  header row, from a live source.
+
+  A reader thread turns lines into {@link ActionRecord}s, skipping symbols the portfolio never
+  held, and puts them on a queue of at most max_pending records; once that is full the reader
+  blocks, and so does the producer once the pipe or socket buffer between them fills. The
+  applier takes records off the queue in batches of one day's actions, applying a batch as
+  soon as the queue runs dry, it reaches max_batch records, its oldest record has waited
+  max_latency seconds, or the next record is for a later day. After each batch it calls
+  publish(portfolio, records, latency), where latency is how long the oldest record waited.
+
+  However the applier finishes, including on an error, it stops the reader and closes the
+  source if the source has a close method (such as {@link SocketSource} and
+  {@link FileSource}), then waits up to STOP_TIMEOUT seconds for the reader to exit.
+  """
+
+  STOP_TIMEOUT = 5.0
+
+  _END = object()
+
+  def __init__(self, portfolio, simulator, publish, max_pending=1024, max_batch=256, max_latency=0.5,
+               date_format="%m/%d/%Y", clock=time.time):
+    self.portfolio = portfolio
+    self.simulator = simulator
+    self.publish = publish
+    self.max_batch = max_batch
+    self.max_latency = max_latency
+    self.date_format = date_format
+    self.clock = clock
+    self.queue = Queue(max_pending)
+    self.stopped = threading.Event()
+    self.abandoned = threading.Event()
+    self.error = None
+
+  def run(self, source):
+    """
+    Applies records from source, an iterable of lines, until it ends. Returns the number of
+    records applied.
+    """
+    reader = threading.Thread(target=self._read, args=(source,), name='actions-feed')
+    reader.daemon = True
+    reader.start()
+    try:
+      applied = self._apply_all()
+    finally:
+      self.abandoned.set()
+      self.stop()
+      if hasattr(source, 'close'):
+        source.close()
+      reader.join(self.STOP_TIMEOUT)
+    if self.error:
+      raise self.error
+    return applied
+
+  def stop(self):
+    """
+    Stops following a growing file; the records already read are still applied.
+    """
+    self.stopped.set()
+
+  def _apply_all(self):
+    applied, pending, current = 0, [], None
+    while True:
+      try:
+        # Wait with a timeout, since an indefinite Queue.get cannot be interrupted by Ctrl-C
+        item = self.queue.get(True, 1.0)
+      except Empty:
+        continue
+      if item is self._END:
+        break
+      arrived, record = item
+      if current is not None and record.ordinal < current:
+        raise ValueError("Actions are not in date order: %s follows %s" % (record.date, date.fromordinal(current)))
+      if pending and record.ordinal != current:
+        applied += self._apply(pending, oldest)
+        pending = []
+      if not pending:
+        oldest = arrived
+      current = record.ordinal
+      pending.append(record)
+      if self.queue.empty() or len(pending) >= self.max_batch or self.clock() - oldest >= self.max_latency:
+        applied += self._apply(pending, oldest)
+        pending = []
+    if pending:
+      applied += self._apply(pending, oldest)
+    return applied
+
+  def _read(self, source):
+    try:
+      for record in CsvActionsSerializer.iter_records(source, self.date_format, symbols=self.portfolio.symbols):
+        if not self._put((self.clock(), record)) or self.stopped.is_set():
+          break
+    except Exception as e:
+      if not self.abandoned.is_set():
+        self.error = e
+    finally:
+      self._put(self._END)
+
+  def _put(self, item):
+    """
+    Queues an item, waiting while the queue is full unless the applier has finished. Returns
+    whether the item was queued.
+    """
+    while not self.abandoned.is_set():
+      try:
+        self.queue.put(item, True, 0.1)
+        return True
+      except Full:
+        pass
+    return False
+
+  def _apply(self, records, oldest):
+    self.portfolio.clear_changes()
+    self.simulator.apply_day(records, self.portfolio)
+    self.publish(self.portfolio, records, self.clock() - oldest)
+    return len(records)
+
+
+def produce(rows, stream, interval=0.0):
+  """
+  Stands in for the vendor: writes rows (lines, including the header) to stream one at a time,
+  flushing each and pausing interval seconds between them.
+  """
+  for row in rows:
+    stream.write(row if row.endswith('\n') else row + '\n')
+    stream.flush()
+    if interval:
+      time.sleep(interval)
+
+
+def produce_to_socket(address, rows, interval=0.0):
+  """
+  Connects to a feed's socket and produces rows to it, then closes the connection.
+  """
+  family, location = parse_address(address)
+  connection = socket.socket(family, socket.SOCK_STREAM)
+  connection.connect(location)
+  try:
+    stream = connection.makefile('wb')
+    produce(rows, stream, interval)
+    stream.close()
+  finally:
+    connection.close()
+
+if __name__ == '__main__':
+  parser = ArgumentParser()
+  parser.add_argument('address', help="Feed socket: unix:PATH or tcp:HOST:PORT")
+  parser.add_argument('actions_file', help="Actions CSV file to replay")
+  parser.add_argument('--interval', help="Seconds between records", type=float, default=0.0)
+  args = parser.parse_args()
+
+  with open(args.actions_file) as f:
+    produce_to_socket(args.address, f, args.interval)
@@ -0,0 +1,244 @@
+import gc
+from contextlib import contextmanager
+from timeit import default_timer
+
+from problem3.simulator import ActionsSimulator
+
+
+class Histogram(object):
+  """
+  Counts latencies in power-of-two microsecond buckets: bucket n holds latencies below 2**n us.
+  """
+
+  def __init__(self):
+    self.buckets = []
+    self.count = 0
+    self.total = 0.0
+
+  def add(self, seconds):
+    bucket = int(seconds * 1e6).bit_length()
+    if bucket >= len(self.buckets):
+      self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+    self.buckets[bucket] += 1
+    self.count += 1
+    self.total += seconds
+
+  def mean(self):
+    return self.total / self.count if self.count else 0.0
+
+  def percentile(self, fraction):
+    """
+    Returns the upper bound, in seconds, of the bucket holding the given fraction of latencies.
+    """
+    seen, wanted = 0, fraction * self.count
+    for bucket, count in enumerate(self.buckets):
+      seen += count
+      if count and seen >= wanted:
+        return 2 ** bucket / 1e6
+    return 0.0
+
+
+class Stats(object):
+  """
+  What an instrumented replay spent its time on:
+
+    phases:   total seconds per phase (reading actions, loading, serializing, converting...);
+              phases may overlap, e.g. converting happens while updating and serializing
+    parses:   a {@link Histogram} of {@link ActionParser#parse} latency per action type
+    updates:  a {@link Histogram} of {@link Action#update} latency per action type
+    days:     (date, seconds, objects) for each simulated day, where objects is the net
+              change in the number of objects tracked by the garbage collector; counting
+              them walks the whole heap, so only every count_objects_every'th day is
+              counted (the others have None), and never within the day's time
+
+  Only the instrumented wrappers below record anything, so a replay that does not use them
+  pays nothing; see {@link NullStats}.
+  """
+
+  enabled = True
+
+  def __init__(self, clock=default_timer, count_objects_every=100):
+    self.clock = clock
+    self.count_objects_every = count_objects_every
+    self.phases = {}
+    self.parses = {}
+    self.updates = {}
+    self.days = []
+
+  @contextmanager
+  def phase(self, name):
+    started = self.clock()
+    try:
+      yield
+    finally:
+      self.add_phase(name, self.clock() - started)
+
+  def add_phase(self, name, seconds):
+    self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+  def timed(self, name, iterable):
+    """
+    Yields from iterable, adding the time spent producing each item to the named phase.
+    """
+    iterator = iter(iterable)
+    while True:
+      started = self.clock()
+      try:
+        item = next(iterator)
+      except StopIteration:
+        self.add_phase(name, self.clock() - started)
+        return
+      self.add_phase(name, self.clock() - started)
+      yield item
+
+  @contextmanager
+  def day(self, portfolio):
+    """
+    Times applying one day's actions to portfolio, recorded under the date it ends up at.
+    """
+    counting = self.count_objects_every and len(self.days) % self.count_objects_every == 0
+    objects = len(gc.get_objects()) if counting else None
+    started = self.clock()
+    try:
+      yield
+    finally:
+      seconds = self.clock() - started
+      if counting:
+        objects = len(gc.get_objects()) - objects
+      self.days.append((portfolio.date, seconds, objects))
+
+  def parsed(self, kind, seconds):
+    self._histogram(self.parses, kind).add(seconds)
+
+  def updated(self, kind, seconds):
+    self._histogram(self.updates, kind).add(seconds)
+
+  @staticmethod
+  def _histogram(histograms, kind):
+    histogram = histograms.get(kind)
+    if histogram is None:
+      histogram = histograms[kind] = Histogram()
+    return histogram
+
+  def report(self):
+    lines = ["%-24s %12s" % ("Phase", "Seconds")]
+    lines += ["%-24s %12.6f" % (name, seconds) for name, seconds in sorted(self.phases.items())]
+    for title, histograms in (("Parse", self.parses), ("Update", self.updates)):
+      lines += ["", "%-24s %10s %12s %12s %12s" % (title, "Count", "Mean us", "p50 us <", "p99 us <")]
+      lines += ["%-24s %10d %12.1f %12.0f %12.0f" % (kind, h.count, h.mean() * 1e6, h.percentile(0.5) * 1e6, h.percentile(0.99) * 1e6)
+                for kind, h in sorted(histograms.items())]
+    if self.days:
+      seconds = [s for _, s, _ in self.days]
+      lines += ["", "Days: %d, total %.6fs, mean %.6fs" % (len(seconds), sum(seconds), sum(seconds) / len(seconds))]
+      lines += ["  %s %.6fs%s" % (date, s, "" if objects is None else ", %+d objects" % objects)
+                for date, s, objects in sorted(self.days, key=lambda day: -day[1])[:5]]
+    return '\n'.join(lines) + '\n'
+
+
+class NullStats(object):
+  """
+  Stands in for {@link Stats} when instrumentation is off: its phases and timed iterables
+  record nothing, and callers skip the instrumented wrappers when enabled is false.
+  """
+
+  enabled = False
+
+  def phase(self, name):
+    return _NOTHING
+
+  def timed(self, name, iterable):
+    return iterable
+
+
+class _Nothing(object):
+
+  def __enter__(self):
+    pass
+
+  def __exit__(self, *exc_info):
+    return False
+
+_NOTHING = _Nothing()
+
+
+def kind_of(action):
+  return type(action).__name__ if action is not None else 'Unknown'
+
+
+class InstrumentedParser(object):
+  """
+  Wraps an {@link ActionParser}, recording each parse's latency by the type of action parsed.
+  """
+
+  def __init__(self, parser, stats):
+    self.parser = parser
+    self.stats = stats
+
+  def parse(self, description):
+    clock = self.stats.clock
+    started = clock()
+    action = self.parser.parse(description)
+    self.stats.parsed(kind_of(action), clock() - started)
+    return action
+
+
+class InstrumentedActionsSimulator(ActionsSimulator):
+  """
+  An {@link ActionsSimulator} that records each update's latency by action type, and each
+  day's time and object count change.
+  """
+
+  def __init__(self, parser, stats):
+    super(InstrumentedActionsSimulator, self).__init__(InstrumentedParser(parser, stats))
+    self.stats = stats
+
+  def apply_parsed(self, symbol, action, portfolio):
+    clock = self.stats.clock
+    started = clock()
+    super(InstrumentedActionsSimulator, self).apply_parsed(symbol, action, portfolio)
+    self.stats.updated(kind_of(action), clock() - started)
+
+  def apply_day(self, actions, portfolio):
+    with self.stats.day(portfolio):
+      super(InstrumentedActionsSimulator, self).apply_day(actions, portfolio)
+
+
+class InstrumentedDays(object):
+  """
+  Wraps any simulator, such as a {@link ColumnarActionsSimulator}, recording each day's time
+  and object count change; its parses are recorded if it was given an {@link InstrumentedParser}.
+  """
+
+  def __init__(self, simulator, stats):
+    self.simulator = simulator
+    self.stats = stats
+
+  def apply_day(self, actions, portfolio):
+    with self.stats.day(portfolio):
+      self.simulator.apply_day(actions, portfolio)
+
+
+class InstrumentedCurrencyConverter(object):
+  """
+  Wraps a currency converter, adding the time spent converting to the "convert" phase.
+  """
+
+  def __init__(self, converter, stats):
+    self.converter = converter
+    self.stats = stats
+
+  @property
+  def generation(self):
+    """
+    The wrapped converter's rates generation, if it has one, so that portfolios caching its
+    rates still see refreshes.
+    """
+    return getattr(self.converter, 'generation', None)
+
+  def convert(self, value, from_currency, to_currency, date=None):
+    with self.stats.phase('convert'):
+      return self.converter.convert(value, from_currency, to_currency, date)
+
+  def convert_many(self, values, from_currencies, to_currency, date=None):
+    with self.stats.phase('convert'):
+      return self.converter.convert_many(values, from_currencies, to_currency, date)
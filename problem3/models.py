@@ -1,25 +1,127 @@
+from collections import defaultdict
+from datetime import date
+from itertools import groupby
+from operator import attrgetter
+
+# The one date object per ordinal returned by {@link #intern_date}
+_DATES = {}
+
+
 class Portfolio(object):
+  """
+  Keeps a running subtotal of holding values per currency, so {@link #value} costs one
+  conversion per currency rather than one per holding. Anything that changes a holding's
+  shares or price must report it through {@link #revalue}; call {@link #recompute} after
+  editing holdings directly.
+
+  holdings are keyed by a stable internal id, their position in the holdings given. symbols
+  maps every ticker a holding has had to that id, so symbol changes never re-key holdings.
+
+  date is the simulated day the portfolio is at, passed through to currency conversions.
+  changed holds the holdings actions have touched since {@link #clear_changes}.
+  """
 
-  def __init__(self, holdings, currency_converter, cash_value=0.0, cash_currency='USD'):
-    self.holdings = {holding.symbol: holding for holding in holdings}
+  def __init__(self, holdings, currency_converter, cash_value=0.0, cash_currency='USD', date=None):
+    self.holdings = dict(enumerate(holdings))
+    self.symbols = SymbolIndex((holding.symbol, id) for id, holding in self.holdings.iteritems())
     self.cash_value = cash_value
     self.cash_currency = cash_currency
     self.currency_converter = currency_converter
+    self.date = date
+    self.changed = set()
+    self.recompute()
 
   def value(self):
-    holdings_value = sum([self.currency_converter.convert(h.total_value(), h.currency, self.cash_currency)
-                          for h in self.holdings.values()])
+    holdings_value = sum([self.currency_converter.convert(subtotal, currency, self.cash_currency, self.date)
+                          for currency, subtotal in self.subtotals.iteritems()])
     return self.cash_value + holdings_value
 
+  def holding(self, symbol):
+    """
+    Returns the holding that has, or once had, symbol as its ticker; None if there is none.
+    """
+    id = self.symbols.get(symbol)
+    return None if id is None else self.holdings[id]
+
+  def rename(self, holding, new_symbol):
+    """
+    Changes the holding's ticker, keeping its previous tickers as aliases.
+    """
+    self.symbols.alias(holding.symbol, new_symbol)
+    holding.symbol = intern_string(new_symbol)
+    self.changed.add(holding)
+
+  def revalue(self, holding, previous_value):
+    """
+    Adjusts the holding's currency subtotal after its total value changed from previous_value.
+    """
+    self.subtotals[holding.currency] += holding.total_value() - previous_value
+    self.changed.add(holding)
+
+  def mark_changed(self, holding):
+    self.changed.add(holding)
+
+  def changed_holdings(self):
+    return sorted(self.changed, key=attrgetter('symbol'))
+
+  def clear_changes(self):
+    self.changed.clear()
+
+  def recompute(self):
+    """
+    Rebuilds the currency subtotals from every holding.
+    """
+    self.subtotals = defaultdict(float)
+    for h in self.holdings.values():
+      self.subtotals[h.currency] += h.total_value()
+
+class SymbolIndex(object):
+  """
+  Maps current and historical tickers to stable holding ids. Supports "symbol in index".
+  """
+
+  def __init__(self, ids=()):
+    self.ids = dict(ids)
+
+  def get(self, symbol):
+    return self.ids.get(symbol)
+
+  def add(self, symbol, id):
+    self.ids[intern_string(symbol)] = id
+
+  def alias(self, symbol, new_symbol):
+    self.add(new_symbol, self.ids[symbol])
+
+  def items(self):
+    return self.ids.items()
+
+  def __contains__(self, symbol):
+    return symbol in self.ids
+
+  def __iter__(self):
+    return iter(self.ids)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def __repr__(self):
+    return "SymbolIndex<%d symbols>" % len(self.ids)
+
 class Holding(object):
+  """
+  Holdings are mutable and tracked by identity (e.g. in {@link Portfolio#changed}), so they
+  keep identity equality.
+  """
+
+  __slots__ = ('symbol', 'description', 'country', 'shares', 'price', 'currency', 'reinvest_dividends')
 
   def __init__(self, symbol, description, country, shares, price, currency, reinvest_dividends=False):
-    self.symbol = symbol
+    self.symbol = intern_string(symbol)
     self.description = description
-    self.country = country
+    self.country = intern_string(country)
     self.shares = shares
     self.price = price
-    self.currency = currency
+    self.currency = intern_string(currency)
     self.reinvest_dividends = reinvest_dividends
 
   def total_value(self):
@@ -30,11 +132,60 @@ class Holding(object):
            (self.symbol, self.shares, self.price, self.total_value(), self.currency)
 
 class ActionRecord(object):
+  """
+  The date is stored as its proleptic Gregorian ordinal; pass either a date or an ordinal.
+  Records for the same day can share one ordinal object, and share one date object through
+  {@link #intern_date}.
+  """
+
+  __slots__ = ('ordinal', 'symbol', 'description')
 
   def __init__(self, date, symbol, description):
-    self.date = date
-    self.symbol = symbol
+    self.ordinal = date if isinstance(date, int) else date.toordinal()
+    self.symbol = intern_string(symbol)
     self.description = description
 
+  @property
+  def date(self):
+    return intern_date(self.ordinal)
+
+  def __eq__(self, other):
+    return isinstance(other, ActionRecord) and \
+           (self.ordinal, self.symbol, self.description) == (other.ordinal, other.symbol, other.description)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((self.ordinal, self.symbol, self.description))
+
   def __repr__(self):
-    return "Action<date=%s, symbol=%s, description=%s>" % (self.date, self.symbol, self.description)
\ No newline at end of file
+    return "Action<date=%s, symbol=%s, description=%s>" % (self.date, self.symbol, self.description)
+
+
+def intern_date(ordinal):
+  """
+  Returns the date for a proleptic Gregorian ordinal, building only one date object per day so
+  that reading the dates of many records does not allocate one each time.
+  """
+  day = _DATES.get(ordinal)
+  if day is None:
+    day = _DATES[ordinal] = date.fromordinal(ordinal)
+  return day
+
+
+def group_by_day(records):
+  """
+  Groups date-ordered {@link ActionRecord}s into (date, records) pairs, comparing ordinals
+  rather than dates.
+  """
+  for ordinal, day in groupby(records, key=attrgetter('ordinal')):
+    yield intern_date(ordinal), day
+
+
+def intern_string(value):
+  """
+  Interns byte strings so the many holdings and records sharing a symbol or currency share one
+  copy of it; other values are returned unchanged.
+  """
+  return intern(value) if type(value) is str else value
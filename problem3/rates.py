@@ -0,0 +1,224 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from csv import DictReader
+from datetime import datetime
+
+from problem3.actions import CurrencyConverter, convert_many
+
+
+class RateProvider(object):
+  """
+  A source of currency conversion rates, such as an external rate service.
+  """
+
+  def fetch(self):
+    """
+    Returns every available rate as {(from_currency, to_currency): rate}. May block on I/O.
+    """
+    raise Exception("Must be implemented")
+
+
+class StaticRateProvider(RateProvider):
+  """
+  Serves a fixed table; defaults to the {@link CurrencyConverter} table.
+  """
+
+  def __init__(self, table=None):
+    self.table = dict(table or CurrencyConverter.CONVERSION_TABLE)
+
+  def fetch(self):
+    return dict(self.table)
+
+
+class FileRateProvider(RateProvider):
+  """
+  Reads rates from a CSV file with From, To and Rate columns on every fetch. A local stand-in
+  for a rate service: rewrite the file to publish new rates.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+
+  def fetch(self):
+    with open(self.filename) as f:
+      return {(row['From'], row['To']): float(row['Rate']) for row in DictReader(f)}
+
+
+class CachingCurrencyConverter(object):
+  """
+  Converts currencies using rates cached from a {@link RateProvider}. The first fetch happens
+  on construction; after that {@link #convert} only ever reads the cached table, while
+  {@link #refresh} (called directly, through {@link #refresh_if_stale}, or every ttl seconds
+  by the background thread from {@link #start}) swaps in a new one. Concurrent refreshes
+  share a single fetch. generation counts the tables swapped in, so callers that derive
+  something from the rates can tell when to derive it again.
+  """
+
+  def __init__(self, provider, ttl=300.0, clock=time.time):
+    self.provider = provider
+    self.ttl = ttl
+    self.clock = clock
+    self.fetches = 0
+    self.generation = 0
+    self.last_error = None
+    self._rates = {}
+    self._fetched_at = None
+    self._lock = threading.Lock()
+    self._inflight = None
+    self._stopped = threading.Event()
+    self._refresher = None
+    self.refresh()
+
+  def convert(self, value, from_currency, to_currency, date=None):
+    return value * self._rates[(from_currency, to_currency)]
+
+  def convert_many(self, values, from_currencies, to_currency, date=None):
+    return convert_many(self._rates, values, from_currencies, to_currency)
+
+  def is_stale(self):
+    return self.clock() - self._fetched_at >= self.ttl
+
+  def refresh_if_stale(self):
+    if self.is_stale():
+      self.refresh()
+
+  def refresh(self):
+    """
+    Fetches new rates from the provider. A call made while another thread's fetch is in
+    flight waits for and shares that fetch's outcome instead of starting its own.
+    """
+    with self._lock:
+      flight = self._inflight
+      leader = flight is None
+      if leader:
+        flight = self._inflight = _Flight()
+    if not leader:
+      flight.wait()
+      if flight.error:
+        raise flight.error
+      return
+
+    try:
+      rates = self.provider.fetch()
+      self.fetches += 1
+      self._rates, self._fetched_at = rates, self.clock()
+      self.generation += 1
+    except Exception as e:
+      flight.error = self.last_error = e
+      raise
+    finally:
+      with self._lock:
+        self._inflight = None
+      flight.set()
+
+  def start(self):
+    """
+    Starts a daemon thread which refreshes the rates every ttl seconds. Failed refreshes keep
+    the previous rates and are recorded in last_error.
+    """
+    if self._refresher is None:
+      self._stopped.clear()
+      self._refresher = threading.Thread(target=self._refresh_periodically, name='currency-rates')
+      self._refresher.daemon = True
+      self._refresher.start()
+    return self
+
+  def stop(self):
+    self._stopped.set()
+    if self._refresher is not None:
+      self._refresher.join()
+      self._refresher = None
+
+  def _refresh_periodically(self):
+    while not self._stopped.wait(self.ttl):
+      try:
+        self.refresh()
+      except Exception:
+        pass
+
+
+class HistoricalRateStore(object):
+  """
+  Daily rates for each currency pair, kept in date-sorted arrays so the rate in effect on any
+  date (the latest one on or before it) is found by binary search.
+  """
+
+  def __init__(self):
+    self._dates = {}
+    self._rates = {}
+
+  @classmethod
+  def load(cls, iterable, date_format="%m/%d/%Y"):
+    """
+    Builds a store from a CSV of daily rates with Day, From, To and Rate columns, in any order.
+    """
+    rows = defaultdict(list)
+    for row in DictReader(iterable):
+      rows[(row['From'], row['To'])].append((datetime.strptime(row['Day'], date_format).toordinal(), float(row['Rate'])))
+    store = cls()
+    for pair, rates in rows.iteritems():
+      rates.sort()
+      store._dates[pair] = array('l', [day for day, _ in rates])
+      store._rates[pair] = array('d', [rate for _, rate in rates])
+    return store
+
+  def rate(self, from_currency, to_currency, date=None):
+    """
+    Returns the rate in effect on date. A portfolio has no date until its first actions are
+    applied, so with no date this is the earliest rate, in effect at the start of the history.
+    """
+    pair = (from_currency, to_currency)
+    if pair not in self._dates:
+      if from_currency == to_currency:
+        return 1.0
+      raise KeyError("No %s/%s rates" % pair)
+    i = 1 if date is None else bisect_right(self._dates[pair], date.toordinal())
+    if not i:
+      raise KeyError("No %s/%s rate on or before %s" % (from_currency, to_currency, date))
+    return self._rates[pair][i - 1]
+
+
+class HistoricalCurrencyConverter(object):
+  """
+  Converts currencies at the rates in effect on the date of each conversion, as found in a
+  {@link HistoricalRateStore}. Rates are memoized for the current date, so each pair is looked
+  up once per simulated day.
+  """
+
+  def __init__(self, store):
+    self.store = store
+    self._date = None
+    self._memo = {}
+
+  def convert(self, value, from_currency, to_currency, date=None):
+    if date != self._date:
+      self._date, self._memo = date, {}
+    pair = (from_currency, to_currency)
+    rate = self._memo.get(pair)
+    if rate is None:
+      rate = self._memo[pair] = self.store.rate(from_currency, to_currency, date)
+    return value * rate
+
+  def convert_many(self, values, from_currencies, to_currency, date=None):
+    currencies = [from_currencies] if isinstance(from_currencies, basestring) else set(from_currencies)
+    rates = {(c, to_currency): self.convert(1.0, c, to_currency, date) for c in currencies}
+    return convert_many(rates, values, from_currencies, to_currency)
+
+
+class _Flight(object):
+  """
+  Completion of one in-flight fetch, and its error if it failed.
+  """
+
+  def __init__(self):
+    self.done = threading.Event()
+    self.error = None
+
+  def wait(self):
+    self.done.wait()
+
+  def set(self):
+    self.done.set()
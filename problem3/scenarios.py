@@ -0,0 +1,175 @@
+import json
+from StringIO import StringIO
+from _csv import writer
+from locale import format
+
+from problem3.columnar import ColumnarPortfolio, _rounds, numpy
+from problem3.models import Holding, Portfolio, SymbolIndex
+
+
+class Scenario(object):
+  """
+  One what-if variant of a replay. reinvest_dividends is None to keep each holding's own flag,
+  a bool for every holding, or the symbols whose dividends are reinvested while the rest are
+  swept to cash. rates overrides individual {(from_currency, to_currency): rate} conversions.
+  """
+
+  def __init__(self, name, reinvest_dividends=None, rates=None):
+    self.name = name
+    self.reinvest_dividends = reinvest_dividends
+    self.rates = dict(rates or {})
+
+  @classmethod
+  def load(cls, stream):
+    """
+    Reads scenarios from JSON such as:
+
+      {"scenarios": [
+        {"name": "sweep", "reinvest_dividends": false},
+        {"name": "reinvest", "reinvest_dividends": true},
+        {"name": "reinvest GOOG", "reinvest_dividends": ["GOOG"]},
+        {"name": "weak CAD", "rates": {"CAD/USD": 0.70, "USD/CAD": 1.43}}
+      ]}
+    """
+    scenarios = []
+    for spec in json.load(stream)['scenarios']:
+      rates = {tuple(str(pair).split('/')): float(rate) for pair, rate in spec.get('rates', {}).iteritems()}
+      reinvest = spec.get('reinvest_dividends')
+      if isinstance(reinvest, list):
+        reinvest = [str(symbol) for symbol in reinvest]
+      scenarios.append(cls(spec['name'], reinvest, rates))
+    return scenarios
+
+  def reinvest_flags(self, symbols, defaults):
+    if self.reinvest_dividends is None:
+      return defaults
+    if isinstance(self.reinvest_dividends, bool):
+      return [self.reinvest_dividends] * len(symbols)
+    reinvested = set(self.reinvest_dividends)
+    return [symbol in reinvested for symbol in symbols]
+
+  def converter(self, currency_converter):
+    return ScenarioCurrencyConverter(currency_converter, self.rates) if self.rates else currency_converter
+
+  def __repr__(self):
+    return "Scenario<%s>" % self.name
+
+
+class ScenarioCurrencyConverter(object):
+  """
+  Converts with a scenario's overriding rates, falling back to another converter for the rest.
+  """
+
+  def __init__(self, converter, rates):
+    self.converter = converter
+    self.rates = rates
+
+  def convert(self, value, from_currency, to_currency, date=None):
+    rate = self.rates.get((from_currency, to_currency))
+    if rate is None:
+      return self.converter.convert(value, from_currency, to_currency, date)
+    return value * rate
+
+
+class ScenarioPortfolio(ColumnarPortfolio):
+  """
+  A {@link ColumnarPortfolio} replayed under several {@link Scenario}s at once. Shares, prices,
+  reinvest flags and cash gain a leading scenario axis (shares[s, i] is row i under scenario
+  s) and conversion rates are kept per scenario, so one {@link ColumnarActionsSimulator} pass
+  over the actions advances every scenario with the same array operations. Symbols,
+  descriptions and currencies do not depend on the scenario and are shared.
+  """
+
+  def __init__(self, holdings, scenarios, currency_converter, cash_value=0.0, cash_currency='USD', date=None):
+    holdings = list(holdings)
+    super(ScenarioPortfolio, self).__init__(holdings, currency_converter, cash_value, cash_currency, date)
+    self.scenarios = scenarios
+    self.converters = [scenario.converter(currency_converter) for scenario in scenarios]
+    defaults = [h.reinvest_dividends for h in holdings]
+    self.reinvest_dividends = numpy.array([scenario.reinvest_flags(self.symbols, defaults) for scenario in scenarios],
+                                          dtype=numpy.bool_).reshape(len(scenarios), len(holdings))
+    self.shares = numpy.tile(self.shares, (len(scenarios), 1))
+    self.price = numpy.tile(self.price, (len(scenarios), 1))
+    self.cash_value = numpy.repeat(float(cash_value), len(scenarios))
+
+  @classmethod
+  def from_portfolio(cls, portfolio, scenarios):
+    ids = sorted(portfolio.holdings)
+    columnar = cls([portfolio.holdings[id] for id in ids], scenarios, portfolio.currency_converter, portfolio.cash_value,
+                   portfolio.cash_currency, portfolio.date)
+    rows = {id: row for row, id in enumerate(ids)}
+    columnar.index.update((symbol, rows[id]) for symbol, id in portfolio.symbols.items())
+    return columnar
+
+  def to_portfolio(self, scenario=0):
+    """
+    Returns the {@link Portfolio} one scenario has reached.
+    """
+    holdings = [Holding(self.symbols[i], self.descriptions[i], self.countries[i], self.shares[scenario, i],
+                        self.price[scenario, i], self.currencies[self.currency[i]], bool(self.reinvest_dividends[scenario, i]))
+                for i in xrange(len(self.symbols))]
+    portfolio = Portfolio(holdings, self.converters[scenario], float(self.cash_value[scenario]), self.cash_currency, self.date)
+    portfolio.symbols = SymbolIndex(self.index.items())
+    portfolio.changed.update(holdings[row] for row in self.changed_rows)
+    return portfolio
+
+  def rates(self):
+    """
+    Returns the conversion matrices of every scenario as of the portfolio's date: rates[s, from, to].
+    """
+    key = self.rates_key()
+    if self._rates is None or self._rates_for != key:
+      self._rates = numpy.array([[[converter.convert(1.0, f, t, self.date) for t in self.currencies] for f in self.currencies]
+                                 for converter in self.converters]).reshape(len(self.converters), len(self.currencies), -1)
+      self._rates_for = key
+    return self._rates
+
+  def holdings_value(self):
+    """
+    Returns the value of every scenario's holdings, without cash, in the cash currency.
+    """
+    to_cash = self.rates()[:, :, self.currency_code(self.cash_currency)]
+    return numpy.sum(self.shares * self.price * to_cash[:, self.currency], axis=1)
+
+  def value(self):
+    return self.cash_value + self.holdings_value()
+
+  def apply_splits(self, rows, multiples):
+    for r in _rounds(rows):
+      self.shares[:, rows[r]] *= multiples[r]
+      self.price[:, rows[r]] /= multiples[r]
+
+  def apply_cash_dividends(self, rows, values, currencies):
+    rates = self.rates()
+    cash_code = self.currency_code(self.cash_currency)
+    for r in _rounds(rows):
+      held, value, currency = rows[r], values[r], currencies[r]
+      distribution = value * rates[:, currency, self.currency[held]]
+      self.price[:, held] -= distribution
+      reinvest = self.reinvest_dividends[:, held]
+      shares = self.shares[:, held]
+      self.cash_value += numpy.sum(numpy.where(reinvest, 0.0, value * rates[:, currency, cash_code] * shares), axis=1)
+      self.shares[:, held] = numpy.where(reinvest, shares + distribution * shares / self.price[:, held], shares)
+
+
+class ScenarioReportSerializer(object):
+  """
+  Marshalls a {@link ScenarioPortfolio} to a CSV comparison of its scenarios; differences are
+  against the first scenario.
+  """
+
+  @classmethod
+  def serialize(cls, portfolio):
+    output = StringIO()
+    report_writer = writer(output)
+    report_writer.writerow(['Scenario', 'Cash', 'Holdings Value', 'Total Value', 'Currency', 'Difference'])
+    holdings_values = portfolio.holdings_value()
+    totals = portfolio.cash_value + holdings_values
+    for s, scenario in enumerate(portfolio.scenarios):
+      report_writer.writerow([scenario.name, cls._format(portfolio.cash_value[s]), cls._format(holdings_values[s]),
+                              cls._format(totals[s]), portfolio.cash_currency, cls._format(totals[s] - totals[0])])
+    return output
+
+  @staticmethod
+  def _format(value):
+    return format("%.2f", value, grouping=True)
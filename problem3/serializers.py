@@ -1,8 +1,12 @@
+import struct
 from StringIO import StringIO
 from _csv import writer
-from csv import DictReader
-from datetime import datetime
-from locale import atof, atoi, format
+from collections import OrderedDict
+from csv import reader
+from datetime import date, datetime
+from itertools import ifilter
+from locale import atof, atoi, format, localeconv
+from operator import attrgetter, itemgetter
 import re
 from problem3.actions import CashDividendAction, StockSplitAction, StockDividendAction, \
   SymbolChangeAction, NameChangeAction
@@ -14,20 +18,35 @@ class CsvPortfolioSerializer(object):
   Marshalls {@link Portfolio}s to/from CSV.
   """
 
-  @staticmethod
-  def deserialize(iterable, currency_converter, reinvest_dividends=False):
-    holdings = []
-    for row in DictReader(iterable):
-      holdings.append(Holding(row['Symbol'], row['Description'], row['Country'],
-                              atoi(row['Shares']), atof(row['Price']), row['Currency'], reinvest_dividends))
-    return Portfolio(holdings, currency_converter)
+  @classmethod
+  def deserialize(cls, iterable, currency_converter, reinvest_dividends=False):
+    return Portfolio(cls.deserialize_holdings(iterable, reinvest_dividends), currency_converter)
+
+  @classmethod
+  def deserialize_holdings(cls, iterable, reinvest_dividends=False):
+    """
+    Reads {@link Holding}s positionally using the header row's column order. Numbers are parsed
+    with int/float and only fall back to the locale-aware atoi/atof for fields those reject,
+    such as ones with grouping separators.
+    """
+    rows = reader(iterable)
+    header = next(rows)
+    symbol, description, country, shares, price, currency = \
+      [header.index(column) for column in ('Symbol', 'Description', 'Country', 'Shares', 'Price', 'Currency')]
+    if localeconv()['decimal_point'] == '.':
+      parse_int, parse_float = cls._parse_int, cls._parse_float
+    else:
+      parse_int, parse_float = atoi, atof
+    return [Holding(row[symbol], row[description], row[country], parse_int(row[shares]), parse_float(row[price]),
+                    row[currency], reinvest_dividends)
+            for row in rows if row]
 
   @classmethod
-  def serialize(cls, portfolio):
+  def serialize(cls, portfolio, changed_only=False):
     output = StringIO()
     portfolio_writer = writer(output)
     portfolio_writer.writerow(['Symbol', 'Description', 'Country', 'Shares', 'Price', 'Currency', 'Total Value'])
-    for h in portfolio.holdings.values():
+    for h in (portfolio.changed_holdings() if changed_only else portfolio.holdings.values()):
       portfolio_writer.writerow([h.symbol, h.description, h.country, "%.2f" % h.shares, cls._format(h.price), h.currency, cls._format(h.total_value())])
     portfolio_writer.writerow(['CASH', 'Money Market Account', '-', '-', '-', portfolio.cash_currency, cls._format(portfolio.cash_value)])
     portfolio_writer.writerow(['TOTAL', '-', '-', '-', '-', portfolio.cash_currency, cls._format(portfolio.value())])
@@ -37,19 +56,223 @@ class CsvPortfolioSerializer(object):
   def _format(value):
     return format("%.2f", value, grouping=True)
 
+  @staticmethod
+  def _parse_int(value):
+    try:
+      return int(value)
+    except ValueError:
+      return atoi(value)
+
+  @staticmethod
+  def _parse_float(value):
+    try:
+      return float(value)
+    except ValueError:
+      return atof(value)
+
+
+class BinaryPortfolioSerializer(object):
+  """
+  Marshalls {@link Portfolio}s to/from a compact binary stream, one block per simulated day:
+
+    day:     date ordinal (0 if none), holding count, cash value, total value, cash currency
+    holding: record length, then symbol, description, country, currency, shares, price, total value
+
+  Strings are written as a 2-byte length followed by their bytes; numbers are little-endian.
+  Write to a buffered binary stream, e.g. io.open(filename, 'wb').
+  """
+
+  DAY = struct.Struct('<IIdd')
+  NUMBERS = struct.Struct('<ddd')
+  LENGTH = struct.Struct('<I')
+  STRING_LENGTH = struct.Struct('<H')
+
+  @classmethod
+  def serialize(cls, portfolio, stream, changed_only=False):
+    holdings = portfolio.changed_holdings() if changed_only else portfolio.holdings.values()
+    ordinal = portfolio.date.toordinal() if portfolio.date else 0
+    stream.write(cls.DAY.pack(ordinal, len(holdings), portfolio.cash_value, portfolio.value()))
+    stream.write(cls._string(portfolio.cash_currency))
+    for h in holdings:
+      record = ''.join([cls._string(h.symbol), cls._string(h.description), cls._string(h.country), cls._string(h.currency),
+                        cls.NUMBERS.pack(h.shares, h.price, h.total_value())])
+      stream.write(cls.LENGTH.pack(len(record)))
+      stream.write(record)
+
+  @classmethod
+  def deserialize(cls, stream):
+    """
+    Yields (date, cash value, total value, cash currency, holdings) for each day in the stream,
+    where holdings are (symbol, description, country, currency, shares, price, total value) tuples.
+    """
+    while True:
+      header = stream.read(cls.DAY.size)
+      if not header:
+        return
+      ordinal, count, cash_value, total_value = cls.DAY.unpack(header)
+      cash_currency = cls._read_string(stream)
+      holdings = []
+      for _ in xrange(count):
+        length, = cls.LENGTH.unpack(stream.read(cls.LENGTH.size))
+        record = StringIO(stream.read(length))
+        strings = tuple(cls._read_string(record) for _ in xrange(4))
+        holdings.append(strings + cls.NUMBERS.unpack(record.read(cls.NUMBERS.size)))
+      yield (date.fromordinal(ordinal) if ordinal else None), cash_value, total_value, cash_currency, holdings
+
+  @classmethod
+  def _string(cls, value):
+    if isinstance(value, unicode):
+      value = value.encode('utf-8')
+    return cls.STRING_LENGTH.pack(len(value)) + value
+
+  @classmethod
+  def _read_string(cls, stream):
+    length, = cls.STRING_LENGTH.unpack(stream.read(cls.STRING_LENGTH.size))
+    return stream.read(length)
+
 
 class CsvActionsSerializer(object):
   """
   Marshalls {@link Action}s from CSV.
   """
 
+  COLUMNS = ('Day', 'Symbol', 'Corporate Action')
+
+  @classmethod
+  def deserialize(cls, iterable, date_format="%m/%d/%Y", symbols=None):
+    """
+    Reads every record, sorted by date. Records for the same day keep their order in the file.
+
+    Given a portfolio's symbols, only rows that can affect it are kept; see {@link SymbolFilter}.
+    The others are skipped before their date or description is parsed.
+    """
+    rows = reader(iterable)
+    columns = cls._columns(next(rows))
+    rows = ifilter(None, rows)
+    if symbols is not None:
+      rows = SymbolFilter(symbols, columns).select(rows)
+    ordinals = {}
+    return sorted((cls._record(row, columns, date_format, ordinals) for row in rows), key=attrgetter('ordinal'))
+
+  @classmethod
+  def deserialize_by_day(cls, iterable, date_format="%m/%d/%Y", fieldnames=None, symbols=None):
+    """
+    Lazily yields (date, actions) pairs from a file that is already in date order. Only one
+    day's actions are held in memory at a time. Pass fieldnames when iterable starts after the
+    header row, and symbols to skip rows as {@link #deserialize} does.
+
+    A day is yielded once the first kept row of the next day has been read, and before any more.
+    """
+    current, day = None, []
+    for action in cls.iter_records(iterable, date_format, fieldnames, symbols):
+      if action.ordinal != current:
+        if day:
+          yield date.fromordinal(current), day
+        if current and action.ordinal < current:
+          raise ValueError("Actions are not in date order: %s follows %s" % (action.date, date.fromordinal(current)))
+        current, day = action.ordinal, []
+      day.append(action)
+    if day:
+      yield date.fromordinal(current), day
+
+  @classmethod
+  def iter_records(cls, iterable, date_format="%m/%d/%Y", fieldnames=None, symbols=None):
+    """
+    Lazily yields records in file order, reading a line only when the next record is needed,
+    so iterable may be a live source. Takes the same arguments as {@link #deserialize_by_day}.
+    """
+    rows = reader(iterable)
+    columns = cls._columns(fieldnames or next(rows))
+    accept = SymbolFilter(symbols, columns).accept if symbols is not None else None
+    ordinals = {}
+    for row in rows:
+      if row and (accept is None or accept(row)):
+        yield cls._record(row, columns, date_format, ordinals)
+
+  @classmethod
+  def _columns(cls, header):
+    """
+    Returns the positions of the Day, Symbol and Corporate Action columns.
+    """
+    return tuple(header.index(column) for column in cls.COLUMNS)
+
   @staticmethod
-  def deserialize(iterable, date_format="%m/%d/%Y"):
-    actions = []
-    for row in DictReader(iterable):
-      actions.append(ActionRecord(datetime.strptime(row['Day'], date_format).date(), row['Symbol'], row['Corporate Action'].strip()))
-    # Hack alert! Sort by date then description so "symbol change" is at the end for each day.
-    return sorted(actions, key=lambda action: (action.date, action.description))
+  def _record(row, columns, date_format, ordinals):
+    """
+    ordinals caches the ordinal of each Day string seen, so each day is parsed once and all
+    of its records share one ordinal.
+    """
+    day, symbol, description = columns
+    ordinal = ordinals.get(row[day])
+    if ordinal is None:
+      ordinal = ordinals[row[day]] = datetime.strptime(row[day], date_format).toordinal()
+    return ActionRecord(ordinal, row[symbol], row[description].strip())
+
+
+class SymbolFilter(object):
+  """
+  Accepts action rows, read positionally, whose symbol a portfolio holds or has held. Only the
+  Symbol column is looked at, except for accepted symbol changes: their new symbol is accepted
+  from then on, so later actions under it are kept too.
+  """
+
+  SYMBOL_CHANGE = "Symbol change - "
+
+  def __init__(self, symbols, columns):
+    self.symbols = set(symbols)
+    _, self.symbol, self.description = columns
+
+  def accept(self, row):
+    if row[self.symbol] not in self.symbols:
+      return False
+    new_symbol = self.new_symbol(row)
+    if new_symbol:
+      self.symbols.add(new_symbol)
+    return True
+
+  def new_symbol(self, row):
+    """
+    Returns the new symbol of a symbol change row, or None for any other action.
+    """
+    description = row[self.description].strip()
+    if description.startswith(self.SYMBOL_CHANGE):
+      return ActionParser.parse(description).new_symbol
+
+  def select(self, rows):
+    """
+    Returns the accepted rows of an iterable, in order, reading it once. The rows need not be
+    in date order, so a rejected row is held back, indexed by its symbol, while it could still
+    be accepted: if it is a symbol change, or if a symbol change read earlier renames to its
+    symbol. Accepting a symbol accepts the rows held under it. All other rejected rows are
+    dropped as they are read, so a row under a new symbol is only kept if it follows a change
+    naming that symbol.
+    """
+    kept, held, renamed_to = [], {}, set()
+    for i, row in enumerate(rows):
+      symbol = row[self.symbol]
+      if symbol in self.symbols:
+        self._keep(i, row, kept, held)
+        continue
+      new_symbol = self.new_symbol(row)
+      if new_symbol:
+        renamed_to.add(new_symbol)
+      if new_symbol or symbol in renamed_to:
+        held.setdefault(symbol, []).append((i, row))
+    kept.sort(key=itemgetter(0))
+    return [row for _, row in kept]
+
+  def _keep(self, i, row, kept, held):
+    """
+    Keeps an accepted row, along with the held rows its symbol change makes acceptable.
+    """
+    accepted = [(i, row)]
+    while accepted:
+      i, row = accepted.pop()
+      kept.append((i, row))
+      new_symbol = self.new_symbol(row)
+      if new_symbol and new_symbol not in self.symbols:
+        self.symbols.add(new_symbol)
+        accepted.extend(held.pop(new_symbol, ()))
 
 
 class ActionParser(object):
@@ -65,12 +288,17 @@ class ActionParser(object):
     'stock_dividend': "Stock dividend - "
   }
 
+  SEPARATOR = " - "
+
+  # Action kind (the prefix without its separator) => _parse_* function; filled in below the class
+  _PARSERS = {}
+
   @classmethod
   def parse(cls, description):
-    for action, prefix in cls.AVAILABLE_ACTIONS.iteritems():
-      if description.startswith(prefix):
-        parse_action = getattr(cls, '_parse_%s' % action)
-        return parse_action(description[len(prefix):])
+    kind, separator, details = description.partition(cls.SEPARATOR)
+    parse_action = cls._PARSERS.get(kind)
+    if parse_action and separator:
+      return parse_action(details)
 
   @staticmethod
   def _parse_cash_dividend(description):
@@ -92,3 +320,35 @@ class ActionParser(object):
   @staticmethod
   def _parse_stock_dividend(description):
     return StockDividendAction(float(description[:-len("/share")]))
+
+ActionParser._PARSERS = {prefix[:-len(ActionParser.SEPARATOR)]: getattr(ActionParser, '_parse_%s' % action)
+                         for action, prefix in ActionParser.AVAILABLE_ACTIONS.iteritems()}
+
+
+class CachingActionParser(ActionParser):
+  """
+  An {@link ActionParser} which memoizes parsed {@link Action}s in a bounded LRU cache keyed
+  by description. Actions never change during {@link Action#update}, so one instance is safely
+  shared by every record with the same description.
+  """
+
+  def __init__(self, max_size=4096):
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self._cache = OrderedDict()
+
+  def parse(self, description):
+    try:
+      action = self._cache.pop(description)
+      self.hits += 1
+    except KeyError:
+      action = ActionParser.parse(description)
+      self.misses += 1
+      if len(self._cache) >= self.max_size:
+        self._cache.popitem(last=False)
+    self._cache[description] = action
+    return action
+
+  def __repr__(self):
+    return "CachingActionParser<size=%d/%d, hits=%d, misses=%d>" % (len(self._cache), self.max_size, self.hits, self.misses)
@@ -0,0 +1,27 @@
+class ActionsSimulator(object):
+  """
+  Applies {@link ActionRecord}s to a {@link Portfolio}. Actions for symbols the portfolio has
+  never held are dropped.
+  """
+
+  def __init__(self, parser):
+    self.parser = parser
+
+  def apply(self, action, portfolio):
+    portfolio.date = action.date
+    if action.symbol in portfolio.symbols:
+      self.apply_parsed(action.symbol, self.parser.parse(action.description), portfolio)
+
+  def apply_parsed(self, symbol, action, portfolio):
+    """
+    Applies an already parsed {@link Action} to the holding for symbol, if there is one.
+    """
+    if symbol in portfolio.symbols:
+      action.update(portfolio.holding(symbol), portfolio)
+
+  def apply_day(self, actions, portfolio):
+    """
+    Applies one simulated day's actions, in the order given.
+    """
+    for action in actions:
+      self.apply(action, portfolio)
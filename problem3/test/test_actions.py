@@ -92,6 +92,8 @@ class SymbolChangeActionTest(TestCase):
     sut = SymbolChangeAction('FM')
     sut.update(holding, portfolio)
     self.assertEqual('FM', holding.symbol)
+    self.assertIs(holding, portfolio.holding('FM'))
+    self.assertIs(holding, portfolio.holding('IL'))
 
 class CurrencyConverterTest(TestCase):
 
@@ -103,3 +105,10 @@ class CurrencyConverterTest(TestCase):
     converter = CurrencyConverter()
     self.assertEqual(5.25*1.32, converter.convert(5.25, 'USD', 'CAD'))
 
+class ActionEqualityTest(TestCase):
+
+  def test_equality(self):
+    self.assertEqual(StockSplitAction(1, 3), StockSplitAction(1, 3))
+    self.assertNotEqual(StockSplitAction(1, 3), StockSplitAction(3, 1))
+    self.assertNotEqual(StockDividendAction(3), StockSplitAction(1, 3))
+    self.assertEqual(hash(CashDividendAction(0.02, 'USD')), hash(CashDividendAction(0.02, 'USD')))
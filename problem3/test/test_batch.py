@@ -0,0 +1,82 @@
+import imp
+import locale
+import os
+import sys
+from datetime import date
+from shutil import rmtree
+from StringIO import StringIO
+from tempfile import mkdtemp
+from unittest import TestCase
+from problem3.actions import CashDividendAction, StockSplitAction
+from problem3.batch import parse_actions, portfolio_paths, run_batch, simulate
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+
+ACTIONS = [
+  "Day,Symbol,Corporate Action",
+  "06/22/2015,IL,Cash dividend - 1.50 USD/share",
+  "06/22/2015,XX,Stock split - 2 for 1",
+  "06/23/2015,IL,Stock split - 3 for 1",
+  "06/24/2015,XX,Stock split - 2 for 1",
+]
+
+PORTFOLIO = """Symbol,Description,Country,Shares,Price,Currency,Total Value
+IL,Illuminati,BY,%d,10,USD,0
+"""
+
+
+class BatchTest(TestCase):
+
+  def setUp(self):
+    self.directory = mkdtemp()
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def test_parse_actions(self):
+    self.assertEqual([(date(2015, 6, 22), [('IL', CashDividendAction(1.50, 'USD')), ('XX', StockSplitAction(1, 2))]),
+                      (date(2015, 6, 23), [('IL', StockSplitAction(1, 3))]),
+                      (date(2015, 6, 24), [('XX', StockSplitAction(1, 2))])], parse_actions(ACTIONS))
+
+  def test_run_batch(self):
+    for shares in (100, 200):
+      with open(os.path.join(self.directory, 'client%d.csv' % shares), 'w') as f:
+        f.write(PORTFOLIO % shares)
+    output_dir = os.path.join(self.directory, 'output')
+
+    reports = run_batch(portfolio_paths(self.directory), ACTIONS, output_dir, workers=2)
+
+    self.assertEqual([os.path.join(output_dir, 'client100.txt'), os.path.join(output_dir, 'client200.txt')], reports)
+    for shares, report in zip((100, 200), reports):
+      with open(report) as f:
+        lines = f.read().splitlines()
+      self.assertEqual("Portfolio after 2015-06-23", lines[-6])
+      self.assertEqual("IL,Illuminati,BY,%.2f,2.83,USD" % (shares * 3), lines[-4].rsplit(',', 1)[0])
+
+  def test_simulate_matches_problem3(self):
+    portfolio_path = os.path.join(ROOT, 'portfolio.csv')
+    output_file = os.path.join(self.directory, 'portfolio.txt')
+    with open(os.path.join(ROOT, 'corporate_actions.csv')) as f:
+      days = parse_actions(f)
+
+    simulate(portfolio_path, output_file, days)
+
+    with open(output_file) as f:
+      self.assertEqual(self.problem3_report(portfolio_path, os.path.join(ROOT, 'corporate_actions.csv')), f.read())
+
+  def problem3_report(self, portfolio_path, actions_path):
+    """
+    Returns what problem3.py prints for the files, in the locale already set.
+    """
+    setlocale, locale.setlocale = locale.setlocale, lambda *args: setlocale(locale.LC_ALL)
+    try:
+      script = imp.load_source('problem3_script', os.path.join(ROOT, 'problem3.py'))
+    finally:
+      locale.setlocale = setlocale
+    stdout, sys.stdout = sys.stdout, StringIO()
+    try:
+      with open(portfolio_path) as portfolio_file, open(actions_path) as actions_file:
+        script.main(portfolio_file, actions_file, False)
+      return sys.stdout.getvalue()
+    finally:
+      sys.stdout = stdout
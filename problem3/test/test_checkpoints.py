@@ -0,0 +1,78 @@
+import os
+from datetime import date
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from problem3.actions import CurrencyConverter
+from problem3.checkpoints import BinarySnapshotSerializer, Checkpoints, Snapshot
+from problem3.models import Holding, Portfolio
+
+
+class BinarySnapshotSerializerTest(TestCase):
+
+  CONVERTER = CurrencyConverter()
+
+  def test_round_trip(self):
+    holdings = [
+      Holding('IL', 'Illuminati', 'BY', 120.5, 10.25, 'CAD', reinvest_dividends=True),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD')
+    ]
+    portfolio = Portfolio(holdings, self.CONVERTER, 550)
+    portfolio.rename(holdings[1], 'FX')
+    stream = BytesIO()
+    BinarySnapshotSerializer.serialize(Snapshot(portfolio, date(2015, 6, 22), 1234), stream)
+    stream.seek(0)
+
+    sut = BinarySnapshotSerializer.deserialize(stream, self.CONVERTER)
+
+    self.assertEqual((date(2015, 6, 22), 1234, 550), (sut.date, sut.offset, sut.portfolio.cash_value))
+    self.assertEqual(Portfolio(holdings, self.CONVERTER, 550).value(), sut.portfolio.value())
+    il = sut.portfolio.holding('IL')
+    self.assertEqual(('Illuminati', 'BY', 120.5, 10.25, 'CAD', True),
+                     (il.description, il.country, il.shares, il.price, il.currency, il.reinvest_dividends))
+    self.assertIs(sut.portfolio.holding('FM'), sut.portfolio.holding('FX'))
+
+  def test_bad_magic(self):
+    self.assertRaises(ValueError, BinarySnapshotSerializer.deserialize, BytesIO('X' * 64), self.CONVERTER)
+
+
+class CheckpointsTest(TestCase):
+
+  CONVERTER = CurrencyConverter()
+
+  def setUp(self):
+    self.directory = mkdtemp()
+    self.actions = os.path.join(self.directory, 'actions.csv')
+    self.sut = Checkpoints(os.path.join(self.directory, 'snapshot'), every_days=2)
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def append(self, *rows):
+    with open(self.actions, 'a') as f:
+      f.writelines(row + '\n' for row in rows)
+
+  def replay(self, portfolio, snapshot=None):
+    applied = []
+    with open(self.actions) as actions_file:
+      for day, actions in self.sut.days(actions_file, snapshot):
+        applied.extend(a.symbol for a in actions)
+        self.sut.completed(portfolio, day)
+    return applied
+
+  def test_resume_applies_only_new_actions(self):
+    self.append("Day,Symbol,Corporate Action",
+                "06/22/2015,IL,Stock split - 3 for 1",
+                "06/23/2015,FM,Stock split - 3 for 1",
+                "06/24/2015,IL,Stock split - 1 for 3")
+    portfolio = Portfolio([Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')], self.CONVERTER)
+    self.assertEqual(['IL', 'FM', 'IL'], self.replay(portfolio))
+
+    snapshot = self.sut.load(self.CONVERTER)
+    self.assertEqual(date(2015, 6, 23), snapshot.date)
+    self.append("06/25/2015,FM,Stock split - 1 for 3")
+    self.assertEqual(['IL', 'FM'], self.replay(portfolio, snapshot))
+
+  def test_load_without_snapshot(self):
+    self.assertIsNone(self.sut.load(self.CONVERTER))
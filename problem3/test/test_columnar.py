@@ -0,0 +1,98 @@
+from datetime import date
+from unittest import TestCase, skipIf
+from problem3.actions import CurrencyConverter
+from problem3.columnar import ColumnarPortfolio, ColumnarActionsSimulator, numpy
+from problem3.instrumentation import InstrumentedCurrencyConverter, Stats
+from problem3.models import Holding, Portfolio, ActionRecord
+from problem3.rates import CachingCurrencyConverter, StaticRateProvider
+from problem3.serializers import ActionParser
+from problem3.simulator import ActionsSimulator
+
+
+@skipIf(numpy is None, "numpy is not installed")
+class ColumnarActionsSimulatorTest(TestCase):
+
+  CONVERTER = CurrencyConverter()
+
+  ACTIONS = [
+    ActionRecord(date(2015, 6, 22), 'IL', "Cash dividend - 0.50 CAD/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Cash dividend - 1.50 USD/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Cash dividend - 0.25 USD/share"),
+    ActionRecord(date(2015, 6, 22), 'LZ', "Cash dividend - 3 GBp/share"),
+    ActionRecord(date(2015, 6, 22), 'IL', "Name change - new name is \"Illuminated\""),
+    ActionRecord(date(2015, 6, 22), 'LZ', "Stock dividend - 1.075/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Stock split - 3 for 1"),
+    ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 9 for 10"),
+    ActionRecord(date(2015, 6, 22), 'IL', "Symbol change - new symbol is IM"),
+  ]
+
+  def holdings(self):
+    return [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD', reinvest_dividends=True),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD'),
+      Holding('LZ', 'Lizard People', 'GB', 400, 297, 'GBp', reinvest_dividends=True),
+    ]
+
+  def test_apply_day_matches_object_path(self):
+    expected = Portfolio(self.holdings(), self.CONVERTER)
+    ActionsSimulator(ActionParser()).apply_day(self.ACTIONS, expected)
+    sut = ColumnarPortfolio(self.holdings(), self.CONVERTER)
+    ColumnarActionsSimulator(ActionParser()).apply_day(self.ACTIONS, sut)
+
+    actual = sut.to_portfolio()
+    self.assertAlmostEqual(expected.cash_value, actual.cash_value)
+    self.assertAlmostEqual(expected.value(), sut.value())
+    for symbol, _ in expected.symbols.items():
+      holding = expected.holding(symbol)
+      self.assertAlmostEqual(holding.shares, actual.holding(symbol).shares)
+      self.assertAlmostEqual(holding.price, actual.holding(symbol).price)
+      self.assertEqual(holding.description, actual.holding(symbol).description)
+
+  def test_apply_day_in_file_order(self):
+    actions = [
+      ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 2 for 1"),
+      ActionRecord(date(2015, 6, 22), 'IL', "Symbol change - new symbol is IM"),
+      ActionRecord(date(2015, 6, 22), 'IM', "Cash dividend - 0.50 USD/share"),
+      ActionRecord(date(2015, 6, 22), 'XX', "Cash dividend - 0.50 USD/share"),
+      ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 3 for 2"),
+    ]
+    expected = Portfolio(self.holdings(), self.CONVERTER)
+    ActionsSimulator(ActionParser()).apply_day(actions, expected)
+    sut = ColumnarPortfolio(self.holdings(), self.CONVERTER)
+    ColumnarActionsSimulator(ActionParser()).apply_day(actions, sut)
+
+    self.assertAlmostEqual(expected.value(), sut.value())
+    self.assertAlmostEqual(expected.holding('IM').price, sut.to_portfolio().holding('IL').price)
+    self.assertEqual('IM', sut.to_portfolio().holding('IL').symbol)
+
+  def test_round_trip(self):
+    portfolio = Portfolio(self.holdings(), self.CONVERTER, cash_value=550)
+    sut = ColumnarPortfolio.from_portfolio(portfolio)
+    self.assertAlmostEqual(portfolio.value(), sut.value())
+    self.assertAlmostEqual(portfolio.value(), sut.to_portfolio().value())
+
+  def test_round_trip_keeps_aliases(self):
+    portfolio = Portfolio(self.holdings(), self.CONVERTER)
+    portfolio.rename(portfolio.holding('FM'), 'FX')
+    sut = ColumnarPortfolio.from_portfolio(portfolio).to_portfolio()
+    self.assertEqual('FX', sut.holding('FM').symbol)
+    self.assertIs(sut.holding('FM'), sut.holding('FX'))
+
+  def test_rates_follow_refreshes(self):
+    self.assertRatesFollowRefreshes(lambda converter: converter)
+
+  def test_rates_follow_refreshes_when_profiled(self):
+    self.assertRatesFollowRefreshes(lambda converter: InstrumentedCurrencyConverter(converter, Stats()))
+
+  def assertRatesFollowRefreshes(self, wrap):
+    provider = StaticRateProvider()
+    converter = CachingCurrencyConverter(provider)
+    sut = ColumnarPortfolio(self.holdings(), wrap(converter))
+    before = sut.value()
+    provider.table[('GBp', 'USD')] *= 2
+    self.assertEqual(before, sut.value())
+
+    converter.refresh()
+
+    self.assertAlmostEqual(Portfolio(self.holdings(), converter).value(), sut.value())
+    self.assertNotAlmostEqual(before, sut.value())
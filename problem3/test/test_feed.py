@@ -0,0 +1,134 @@
+import os
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from problem3.actions import CurrencyConverter
+from problem3.feed import FileSource, LiveFeed, SocketSource, lines, produce, produce_to_socket
+from problem3.models import Holding, Portfolio
+from problem3.serializers import ActionParser
+from problem3.simulator import ActionsSimulator
+
+
+class RecordingSource(object):
+  """
+  Yields rows, noting when it is closed and when iteration over it has ended.
+  """
+
+  def __init__(self, rows):
+    self.rows = rows
+    self.closed = threading.Event()
+    self.finished = threading.Event()
+
+  def __iter__(self):
+    try:
+      for row in self.rows:
+        yield row
+    finally:
+      self.finished.set()
+
+  def close(self):
+    self.closed.set()
+
+
+class LiveFeedTest(TestCase):
+
+  ACTIONS = [
+    "Day,Symbol,Corporate Action",
+    "06/22/2015,IL,Stock split - 2 for 1",
+    "06/22/2015,IL,Symbol change - new symbol is IM",
+    "06/22/2015,XX,Stock split - 2 for 1",
+    "06/23/2015,IM,Stock split - 3 for 1",
+    "06/23/2015,FM,\"Name change - new name is \"\"Freemasonry\"\"\"",
+    "06/24/2015,FM,Cash dividend - 1.50 USD/share",
+  ]
+
+  def setUp(self):
+    self.directory = mkdtemp()
+    self.holdings = [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD'),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD')
+    ]
+    self.batches = []
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def feed(self, **options):
+    self.portfolio = Portfolio(self.holdings, CurrencyConverter())
+    publish = lambda portfolio, records, latency: self.batches.append([r.date for r in records])
+    return LiveFeed(self.portfolio, ActionsSimulator(ActionParser()), publish, **options)
+
+  def assertApplied(self, applied):
+    self.assertEqual(5, applied)
+    self.assertEqual(('IM', 720, 'Freemasonry'), (self.holdings[0].symbol, self.holdings[0].shares, self.holdings[1].description))
+    self.assertAlmostEqual(250 * 1.50, self.portfolio.cash_value)
+    for batch in self.batches:
+      self.assertEqual(1, len(set(batch)))
+
+  def join(self, thread):
+    thread.join(5)
+    self.assertFalse(thread.is_alive())
+
+  def test_pipe(self):
+    read, write = os.pipe()
+    producer = threading.Thread(target=lambda: self.produce(os.fdopen(write, 'w')))
+    producer.start()
+    applied = self.feed().run(lines(os.fdopen(read)))
+    self.join(producer)
+    self.assertApplied(applied)
+
+  def produce(self, stream):
+    produce(self.ACTIONS, stream)
+    stream.close()
+
+  def test_socket(self):
+    address = 'unix:' + os.path.join(self.directory, 'feed.sock')
+    source = SocketSource(address)
+    producer = threading.Thread(target=produce_to_socket, args=(address, self.ACTIONS))
+    producer.start()
+    applied = self.feed().run(source)
+    self.join(producer)
+    self.assertApplied(applied)
+
+  def test_follow(self):
+    filename = os.path.join(self.directory, 'actions.csv')
+    with open(filename, 'w') as f:
+      f.write('\n'.join(self.ACTIONS[:3]) + '\n' + self.ACTIONS[3][:5])
+    sut = self.feed()
+    published, renamed = threading.Event(), threading.Event()
+
+    def publish(portfolio, records, latency):
+      published.set()
+      if self.holdings[1].description == 'Freemasonry':
+        renamed.set()
+
+    sut.publish = publish
+    source = FileSource(open(filename), sut.stopped, 0.01)
+    consumer = threading.Thread(target=sut.run, args=(source,))
+    consumer.start()
+    self.assertTrue(published.wait(5))
+    with open(filename, 'a') as out:
+      out.write(self.ACTIONS[3][5:] + '\n' + '\n'.join(self.ACTIONS[4:]) + '\n')
+    self.assertTrue(renamed.wait(5))
+    sut.stop()
+    self.join(consumer)
+    self.assertEqual(('IM', 720), (self.holdings[0].symbol, self.holdings[0].shares))
+    self.assertTrue(source.file.closed)
+
+  def test_backpressure(self):
+    sut = self.feed(max_pending=1, max_batch=1)
+    self.assertApplied(sut.run(iter(self.ACTIONS)))
+    self.assertEqual(5, len(self.batches))
+
+  def test_out_of_order(self):
+    sut = self.feed()
+    self.assertRaises(ValueError, sut.run, iter(self.ACTIONS[:5] + ["06/22/2015,FM,Stock split - 2 for 1"]))
+
+  def test_out_of_order_stops_reader(self):
+    rows = self.ACTIONS[:5] + ["06/22/2015,FM,Stock split - 2 for 1"] + ["06/25/2015,FM,Stock split - 2 for 1"] * 100
+    source = RecordingSource(rows)
+    sut = self.feed(max_pending=1)
+    self.assertRaises(ValueError, sut.run, source)
+    self.assertTrue(source.closed.is_set())
+    self.assertTrue(source.finished.wait(5))
@@ -0,0 +1,72 @@
+from datetime import date
+from unittest import TestCase
+from problem3.actions import CurrencyConverter
+from problem3.instrumentation import Histogram, InstrumentedActionsSimulator, InstrumentedCurrencyConverter, NullStats, Stats
+from problem3.models import Holding, Portfolio, ActionRecord
+from problem3.serializers import ActionParser
+
+
+class HistogramTest(TestCase):
+
+  def test_percentile(self):
+    sut = Histogram()
+    for seconds in (0.000001, 0.000003, 0.000003, 0.001):
+      sut.add(seconds)
+    self.assertEqual(4, sut.count)
+    self.assertEqual(4e-6, sut.percentile(0.5))
+    self.assertEqual(1024e-6, sut.percentile(1.0))
+    self.assertEqual(0.0, Histogram().percentile(0.5))
+
+
+class StatsTest(TestCase):
+
+  def test_phases(self):
+    now = [0]
+    sut = Stats(clock=lambda: now[0])
+    with sut.phase('serialize'):
+      now[0] += 2
+    with sut.phase('serialize'):
+      now[0] += 1
+    self.assertEqual({'serialize': 3}, sut.phases)
+
+  def test_days_sample_object_counts(self):
+    now = [0]
+    sut = Stats(clock=lambda: now[0], count_objects_every=2)
+    portfolio = Portfolio([], CurrencyConverter())
+    kept = []
+    for day in (22, 23, 24):
+      portfolio.date = date(2015, 6, day)
+      with sut.day(portfolio):
+        kept.append([[] for _ in xrange(1000)])
+        now[0] += 1
+    self.assertEqual([1, 1, 1], [seconds for _, seconds, _ in sut.days])
+    self.assertEqual([False, True, False], [objects is None for _, _, objects in sut.days])
+    self.assertGreaterEqual(sut.days[0][2], 1000)
+
+  def test_timed(self):
+    sut = Stats()
+    self.assertEqual([1, 2], list(sut.timed('read actions', [1, 2])))
+    self.assertIn('read actions', sut.phases)
+
+  def test_null_stats(self):
+    sut = NullStats()
+    items = [1, 2]
+    with sut.phase('serialize'):
+      pass
+    self.assertIs(items, sut.timed('read actions', items))
+
+  def test_instrumented_simulator(self):
+    stats = Stats()
+    holding = Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')
+    portfolio = Portfolio([holding], InstrumentedCurrencyConverter(CurrencyConverter(), stats))
+    InstrumentedActionsSimulator(ActionParser(), stats).apply_day([
+      ActionRecord(date(2015, 6, 22), 'IL', "Cash dividend - 0.50 CAD/share"),
+      ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 2 for 1"),
+      ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 3 for 1"),
+    ], portfolio)
+    self.assertEqual({'CashDividendAction': 1, 'StockSplitAction': 2},
+                     {kind: h.count for kind, h in stats.updates.items()})
+    self.assertEqual(3, sum(h.count for h in stats.parses.values()))
+    self.assertEqual([date(2015, 6, 22)], [day for day, _, _ in stats.days])
+    self.assertIn('convert', stats.phases)
+    self.assertIn('StockSplitAction', stats.report())
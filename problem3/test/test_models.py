@@ -1,6 +1,9 @@
+from datetime import date
 from unittest import TestCase
-from problem3.actions import CurrencyConverter
-from problem3.models import Holding, Portfolio
+from problem3.actions import CurrencyConverter, CashDividendAction, StockSplitAction, NameChangeAction
+from problem3.models import Holding, Portfolio, ActionRecord, group_by_day
+from problem3.serializers import ActionParser
+from problem3.simulator import ActionsSimulator
 
 
 class PortfolioTest(TestCase):
@@ -39,8 +42,90 @@ class PortfolioTest(TestCase):
     share_price = 10 * self.CONVERTER.CONVERSION_TABLE[('CAD', 'USD')]
     self.assertEqual(120*share_price + 250*25 + 550, portfolio.value())
 
+  def test_value_tracks_updates(self):
+    holdings = [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'CAD'),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD', reinvest_dividends=True)
+    ]
+    portfolio = Portfolio(holdings, self.CONVERTER)
+    CashDividendAction(1.50, 'USD').update(holdings[0], portfolio)
+    CashDividendAction(1.50, 'USD').update(holdings[1], portfolio)
+    StockSplitAction(1, 3).update(holdings[1], portfolio)
+    incremental = portfolio.value()
+    portfolio.recompute()
+    self.assertAlmostEqual(portfolio.value(), incremental)
+    self.assertAlmostEqual(250*25 + 120*(10 - 1.50*1.32)*0.76 + 120*1.50, incremental)
+
+  def test_changed_holdings(self):
+    holdings = [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD'),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD'),
+      Holding('LZ', 'Lizard People', 'GB', 400, 297, 'GBp')
+    ]
+    portfolio = Portfolio(holdings, self.CONVERTER)
+    StockSplitAction(1, 3).update(holdings[2], portfolio)
+    NameChangeAction('Freemasonry').update(holdings[1], portfolio)
+    self.assertEqual([holdings[1], holdings[2]], portfolio.changed_holdings())
+    portfolio.clear_changes()
+    self.assertEqual([], portfolio.changed_holdings())
+
+  def test_recompute(self):
+    holding = Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')
+    portfolio = Portfolio([holding], self.CONVERTER)
+    holding.shares = 200
+    portfolio.recompute()
+    self.assertEqual(2000, portfolio.value())
+
+  def test_symbol_change_chain(self):
+    holding = Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')
+    portfolio = Portfolio([holding], self.CONVERTER)
+    ActionsSimulator(ActionParser()).apply_day([
+      ActionRecord(date(2015, 6, 22), 'IL', "Symbol change - new symbol is IM"),
+      ActionRecord(date(2015, 6, 22), 'IM', "Symbol change - new symbol is IN"),
+      ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 2 for 1"),
+      ActionRecord(date(2015, 6, 22), 'IN', "Stock split - 3 for 1"),
+    ], portfolio)
+    self.assertEqual(('IN', 720), (holding.symbol, holding.shares))
+    self.assertEqual([0], portfolio.holdings.keys())
+
+  def test_unheld_symbol_dropped(self):
+    holding = Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')
+    portfolio = Portfolio([holding], self.CONVERTER)
+    ActionsSimulator(ActionParser()).apply(ActionRecord(date(2015, 6, 22), 'XX', "Stock split - 2 for 1"), portfolio)
+    self.assertEqual(1200, portfolio.value())
+    self.assertIsNone(portfolio.holding('XX'))
+
 class HoldingTest(TestCase):
 
   def test_total_value(self):
     holding = Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD')
     self.assertEqual(1200, holding.total_value())
+
+  def test_interned_strings(self):
+    holding = Holding(''.join(['I', 'L']), 'Illuminati', 'BY', 120, 10, ''.join(['US', 'D']))
+    self.assertIs(intern('IL'), holding.symbol)
+    self.assertIs(intern('USD'), holding.currency)
+
+class ActionRecordTest(TestCase):
+
+  def test_date(self):
+    sut = ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 3 for 1")
+    self.assertEqual(date(2015, 6, 22), sut.date)
+    self.assertEqual(date(2015, 6, 22).toordinal(), sut.ordinal)
+
+  def test_dates_shared(self):
+    first = ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 3 for 1")
+    second = ActionRecord(date(2015, 6, 22), 'FM', "Stock split - 2 for 1")
+    self.assertIs(first.date, first.date)
+    self.assertIs(first.date, second.date)
+
+  def test_group_by_day(self):
+    records = [ActionRecord(date(2015, 6, day), symbol, "Stock split - 3 for 1") for day, symbol in
+               [(22, 'IL'), (22, 'FM'), (23, 'IL'), (25, 'FM')]]
+    sut = [(day, [r.symbol for r in day_records]) for day, day_records in group_by_day(records)]
+    self.assertEqual([(date(2015, 6, 22), ['IL', 'FM']), (date(2015, 6, 23), ['IL']), (date(2015, 6, 25), ['FM'])], sut)
+
+  def test_equality(self):
+    sut = ActionRecord(date(2015, 6, 22), 'IL', "Stock split - 3 for 1")
+    self.assertEqual(ActionRecord(date(2015, 6, 22).toordinal(), 'IL', "Stock split - 3 for 1"), sut)
+    self.assertNotEqual(ActionRecord(date(2015, 6, 23), 'IL', "Stock split - 3 for 1"), sut)
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from Queue import Queue
+from datetime import date
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from problem3.actions import CurrencyConverter
+from problem3.models import Holding, Portfolio, ActionRecord
+from problem3.rates import CachingCurrencyConverter, FileRateProvider, RateProvider, StaticRateProvider, \
+  HistoricalRateStore, HistoricalCurrencyConverter
+from problem3.serializers import ActionParser
+from problem3.simulator import ActionsSimulator
+
+
+class BlockingRateProvider(RateProvider):
+  """
+  Serves the first fetch straight away; later ones signal started, then block until released.
+  """
+
+  def __init__(self):
+    self.fetches = 0
+    self.started = threading.Event()
+    self.released = threading.Event()
+
+  def fetch(self):
+    self.fetches += 1
+    if self.fetches > 1:
+      self.started.set()
+      self.released.wait(5)
+    return {('USD', 'CAD'): 1.30 + self.fetches / 100.0}
+
+
+class FileRateProviderTest(TestCase):
+
+  def setUp(self):
+    self.directory = mkdtemp()
+    self.filename = os.path.join(self.directory, 'rates.csv')
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def publish(self, rate):
+    with open(self.filename, 'w') as f:
+      f.write("From,To,Rate\nUSD,CAD,%s\n" % rate)
+
+  def test_fetch(self):
+    self.publish(1.32)
+    self.assertEqual({('USD', 'CAD'): 1.32}, FileRateProvider(self.filename).fetch())
+
+  def test_converter_uses_cache_until_refresh(self):
+    self.publish(1.32)
+    now = [0]
+    sut = CachingCurrencyConverter(FileRateProvider(self.filename), ttl=60, clock=lambda: now[0])
+    self.publish(1.40)
+    self.assertEqual(1.32 * 5, sut.convert(5, 'USD', 'CAD'))
+    sut.refresh_if_stale()
+    self.assertEqual(1.32 * 5, sut.convert(5, 'USD', 'CAD'))
+    now[0] = 60
+    sut.refresh_if_stale()
+    self.assertEqual(1.40 * 5, sut.convert(5, 'USD', 'CAD'))
+
+  def test_background_refresh(self):
+    self.publish(1.32)
+    sut = CachingCurrencyConverter(FileRateProvider(self.filename), ttl=0.01).start()
+    try:
+      self.publish(1.40)
+      deadline = time.time() + 5
+      while sut.convert(1, 'USD', 'CAD') != 1.40 and time.time() < deadline:
+        time.sleep(0.01)
+      self.assertEqual(1.40, sut.convert(1, 'USD', 'CAD'))
+    finally:
+      sut.stop()
+
+
+class CachingCurrencyConverterTest(TestCase):
+
+  def test_static_provider_matches_converter(self):
+    sut = CachingCurrencyConverter(StaticRateProvider())
+    self.assertEqual(CurrencyConverter.convert(5.25, 'GBp', 'CAD'), sut.convert(5.25, 'GBp', 'CAD'))
+
+  def test_concurrent_refreshes_share_one_fetch(self):
+    provider = BlockingRateProvider()
+    sut = CachingCurrencyConverter(provider)
+    leader = threading.Thread(target=sut.refresh)
+    leader.start()
+    self.assertTrue(provider.started.wait(5))
+
+    # Hold the fetch until every follower is waiting on it
+    flight, joined = sut._inflight, Queue()
+    wait = flight.wait
+    flight.wait = lambda: (joined.put(None), wait())
+    followers = [threading.Thread(target=sut.refresh) for _ in xrange(4)]
+    for thread in followers:
+      thread.start()
+    for _ in followers:
+      joined.get(timeout=5)
+    provider.released.set()
+    for thread in [leader] + followers:
+      thread.join(5)
+      self.assertFalse(thread.is_alive())
+
+    self.assertEqual(2, provider.fetches)
+    self.assertEqual(2, sut.generation)
+    self.assertEqual(1.32, sut.convert(1, 'USD', 'CAD'))
+
+  def test_convert_many(self):
+    sut = CachingCurrencyConverter(StaticRateProvider())
+    self.assertEqual([1.32, 2.64], sut.convert_many([1, 2], 'USD', 'CAD'))
+    self.assertEqual([1.32, 2 * 2.07], sut.convert_many([1, 2], ['USD', 'GBp'], 'CAD'))
+
+
+class HistoricalRateStoreTest(TestCase):
+
+  RATES = [
+    "Day,From,To,Rate",
+    "06/23/2015,CAD,USD,0.80",
+    "06/01/2015,CAD,USD,0.76",
+    "06/01/2015,USD,CAD,1.32",
+  ]
+
+  def test_rate_as_of(self):
+    sut = HistoricalRateStore.load(self.RATES)
+    self.assertEqual(0.76, sut.rate('CAD', 'USD', date(2015, 6, 1)))
+    self.assertEqual(0.76, sut.rate('CAD', 'USD', date(2015, 6, 22)))
+    self.assertEqual(0.80, sut.rate('CAD', 'USD', date(2015, 6, 23)))
+    self.assertEqual(0.80, sut.rate('CAD', 'USD', date(2016, 1, 1)))
+    self.assertEqual(0.76, sut.rate('CAD', 'USD'))
+    self.assertEqual(1.0, sut.rate('GBp', 'GBp', date(2015, 6, 1)))
+
+  def test_rate_missing(self):
+    sut = HistoricalRateStore.load(self.RATES)
+    self.assertRaises(KeyError, sut.rate, 'CAD', 'USD', date(2015, 5, 31))
+    self.assertRaises(KeyError, sut.rate, 'GBp', 'USD', date(2015, 6, 1))
+
+  def test_initial_value_at_earliest_rates(self):
+    converter = HistoricalCurrencyConverter(HistoricalRateStore.load(self.RATES))
+    portfolio = Portfolio([Holding('IL', 'Illuminati', 'BY', 100, 10, 'CAD')], converter)
+    self.assertAlmostEqual(760, portfolio.value())
+    portfolio.date = date(2015, 6, 23)
+    self.assertAlmostEqual(800, portfolio.value())
+
+  def test_simulator_converts_as_of_action_date(self):
+    converter = HistoricalCurrencyConverter(HistoricalRateStore.load(self.RATES))
+    holding = Holding('IL', 'Illuminati', 'BY', 100, 10, 'USD')
+    portfolio = Portfolio([holding], converter)
+    simulator = ActionsSimulator(ActionParser())
+    simulator.apply(ActionRecord(date(2015, 6, 22), 'IL', "Cash dividend - 1 CAD/share"), portfolio)
+    self.assertAlmostEqual(76, portfolio.cash_value)
+    simulator.apply(ActionRecord(date(2015, 6, 23), 'IL', "Cash dividend - 1 CAD/share"), portfolio)
+    self.assertAlmostEqual(156, portfolio.cash_value)
+    self.assertAlmostEqual(10 - 0.76 - 0.80, holding.price)
@@ -0,0 +1,73 @@
+from datetime import date
+from StringIO import StringIO
+from unittest import TestCase, skipIf
+from problem3.actions import CurrencyConverter
+from problem3.columnar import ColumnarActionsSimulator, numpy
+from problem3.models import Holding, Portfolio, ActionRecord
+from problem3.scenarios import Scenario, ScenarioPortfolio, ScenarioReportSerializer
+from problem3.serializers import ActionParser
+from problem3.simulator import ActionsSimulator
+
+
+@skipIf(numpy is None, "numpy is not installed")
+class ScenarioPortfolioTest(TestCase):
+
+  CONVERTER = CurrencyConverter()
+
+  ACTIONS = [
+    ActionRecord(date(2015, 6, 22), 'IL', "Cash dividend - 0.50 CAD/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Cash dividend - 1.50 USD/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Cash dividend - 0.25 USD/share"),
+    ActionRecord(date(2015, 6, 22), 'LZ', "Cash dividend - 3 GBp/share"),
+    ActionRecord(date(2015, 6, 22), 'LZ', "Stock dividend - 1.075/share"),
+    ActionRecord(date(2015, 6, 22), 'FM', "Stock split - 3 for 1"),
+    ActionRecord(date(2015, 6, 22), 'IL', "Symbol change - new symbol is IM"),
+    ActionRecord(date(2015, 6, 22), 'IM', "Cash dividend - 0.10 USD/share"),
+  ]
+
+  SCENARIOS = [
+    Scenario('sweep', False),
+    Scenario('reinvest', True),
+    Scenario('reinvest FM', ['FM']),
+    Scenario('weak CAD', rates={('CAD', 'USD'): 0.70}),
+  ]
+
+  def holdings(self):
+    return [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD', reinvest_dividends=True),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD'),
+      Holding('LZ', 'Lizard People', 'GB', 400, 297, 'GBp'),
+    ]
+
+  def test_scenarios_match_separate_replays(self):
+    sut = ScenarioPortfolio(self.holdings(), self.SCENARIOS, self.CONVERTER, cash_value=100)
+    ColumnarActionsSimulator(ActionParser()).apply_day(self.ACTIONS, sut)
+    values = sut.value()
+
+    for s, scenario in enumerate(self.SCENARIOS):
+      holdings = self.holdings()
+      for holding, reinvest in zip(holdings, scenario.reinvest_flags([h.symbol for h in holdings], [h.reinvest_dividends for h in holdings])):
+        holding.reinvest_dividends = reinvest
+      expected = Portfolio(holdings, scenario.converter(self.CONVERTER), cash_value=100)
+      ActionsSimulator(ActionParser()).apply_day(self.ACTIONS, expected)
+
+      actual = sut.to_portfolio(s)
+      self.assertAlmostEqual(expected.value(), values[s])
+      self.assertAlmostEqual(expected.cash_value, actual.cash_value)
+      for symbol in ('IL', 'IM', 'FM', 'LZ'):
+        self.assertAlmostEqual(expected.holding(symbol).shares, actual.holding(symbol).shares)
+        self.assertAlmostEqual(expected.holding(symbol).price, actual.holding(symbol).price)
+
+  def test_load(self):
+    sut = Scenario.load(StringIO('{"scenarios": [{"name": "base"}, {"name": "GOOG", "reinvest_dividends": ["GOOG"]},'
+                                 ' {"name": "CAD", "rates": {"CAD/USD": 0.7}}]}'))
+    self.assertEqual(['base', 'GOOG', 'CAD'], [s.name for s in sut])
+    self.assertEqual([None, ['GOOG'], None], [s.reinvest_dividends for s in sut])
+    self.assertEqual({('CAD', 'USD'): 0.7}, sut[2].rates)
+
+  def test_report(self):
+    sut = ScenarioPortfolio(self.holdings(), self.SCENARIOS[:2], self.CONVERTER)
+    ColumnarActionsSimulator(ActionParser()).apply_day(self.ACTIONS[1:2], sut)
+    lines = ScenarioReportSerializer.serialize(sut).getvalue().splitlines()
+    self.assertEqual(['Scenario', 'sweep', 'reinvest'], [line.split(',')[0] for line in lines])
+    self.assertEqual('0.00', lines[2].rsplit(',', 1)[1])
@@ -1,6 +1,14 @@
+import gc
+import locale
+from datetime import date
+from io import BytesIO
 from unittest import TestCase
-from problem3.actions import CashDividendAction, StockSplitAction, StockDividendAction, SymbolChangeAction, NameChangeAction
-from problem3.serializers import ActionParser
+from weakref import ref
+from problem3.actions import CashDividendAction, StockSplitAction, StockDividendAction, SymbolChangeAction, NameChangeAction, \
+  CurrencyConverter
+from problem3.models import Holding, Portfolio
+from problem3.serializers import ActionParser, CachingActionParser, CsvActionsSerializer, CsvPortfolioSerializer, \
+  BinaryPortfolioSerializer, SymbolFilter
 
 
 class ActionParserTest(TestCase):
@@ -19,3 +27,144 @@ class ActionParserTest(TestCase):
 
   def test_parse_name_change(self):
     self.assertEqual(NameChangeAction('Blackberry'), ActionParser.parse("Name change - new name is \"Blackberry\""))
+
+  def test_parse_unknown(self):
+    self.assertIsNone(ActionParser.parse("Spin-off - 1 XYZ/share"))
+    self.assertIsNone(ActionParser.parse("Cash dividend"))
+
+
+class CachingActionParserTest(TestCase):
+
+  def test_parse_cached(self):
+    sut = CachingActionParser()
+    first = sut.parse("Cash dividend - 0.02 USD/share")
+    self.assertIs(first, sut.parse("Cash dividend - 0.02 USD/share"))
+    self.assertEqual(CashDividendAction(0.02, 'USD'), first)
+    self.assertEqual((1, 1), (sut.hits, sut.misses))
+
+  def test_parse_evicts_least_recently_used(self):
+    sut = CachingActionParser(max_size=2)
+    sut.parse("Stock split - 9 for 10")
+    sut.parse("Stock split - 3 for 1")
+    sut.parse("Stock split - 9 for 10")
+    sut.parse("Stock split - 1 for 3")
+    sut.parse("Stock split - 9 for 10")
+    sut.parse("Stock split - 3 for 1")
+    self.assertEqual((2, 4), (sut.hits, sut.misses))
+
+
+class CsvActionsSerializerTest(TestCase):
+
+  ACTIONS = [
+    "Day,Symbol,Corporate Action",
+    "06/22/2015,RIM,Symbol change - new symbol is BB",
+    "06/22/2015,RIM,\"Name change - new name is \"\"Blackberry\"\"\"",
+    "06/23/2015,INTC,Cash dividend - 0.21 USD/share",
+    "06/24/2015,GOOG,Stock split - 3 for 1",
+  ]
+
+  def test_deserialize_by_day(self):
+    days = list(CsvActionsSerializer.deserialize_by_day(self.ACTIONS))
+    self.assertEqual([date(2015, 6, 22), date(2015, 6, 23), date(2015, 6, 24)], [d for d, _ in days])
+    self.assertEqual(['Symbol change - new symbol is BB', 'Name change - new name is "Blackberry"'],
+                     [a.description for a in days[0][1]])
+    self.assertEqual(['INTC'], [a.symbol for a in days[1][1]])
+
+  def test_deserialize_by_day_is_lazy(self):
+    rows = iter(self.ACTIONS)
+    days = CsvActionsSerializer.deserialize_by_day(rows)
+    next(days)
+    self.assertEqual(self.ACTIONS[4], next(rows))
+
+  def test_deserialize_by_day_out_of_order(self):
+    days = CsvActionsSerializer.deserialize_by_day([self.ACTIONS[0], self.ACTIONS[3], self.ACTIONS[1]])
+    self.assertRaises(ValueError, list, days)
+
+  def test_deserialize_by_day_filters_symbols(self):
+    actions = self.ACTIONS + ["06/24/2015,BB,Stock split - 2 for 1", "06/25/2015,GOOG,not a date"]
+    days = list(CsvActionsSerializer.deserialize_by_day(actions, symbols=['RIM', 'INTC']))
+    self.assertEqual([date(2015, 6, 22), date(2015, 6, 23), date(2015, 6, 24)], [d for d, _ in days])
+    self.assertEqual(['BB'], [a.symbol for a in days[2][1]])
+
+  def test_deserialize_filters_symbols_in_any_order(self):
+    actions = [self.ACTIONS[0], "06/23/2015,BB,Symbol change - new symbol is CC", "06/25/2015,CC,Stock split - 2 for 1",
+               "06/24/2015,DD,Stock split - 2 for 1", "06/24/2015,CC,Symbol change - new symbol is DD",
+               "06/21/2015,QQ,Stock split - 2 for 1", self.ACTIONS[1], "06/26/2015,DD,Stock split - 3 for 1"]
+    sut = CsvActionsSerializer.deserialize(actions, symbols=['RIM'])
+    self.assertEqual([('RIM', 22), ('BB', 23), ('CC', 24), ('CC', 25), ('DD', 26)],
+                     [(a.symbol, a.date.day) for a in sut])
+
+  def test_select_drops_rejected_rows(self):
+    rejected = []
+
+    def rows():
+      yield ['06/22/2015', 'RIM', 'Symbol change - new symbol is BB']
+      for i in xrange(100):
+        row = Row(['06/22/2015', 'S%d' % i, 'Stock split - 2 for 1'])
+        rejected.append(ref(row))
+        yield row
+      yield ['06/23/2015', 'BB', 'Stock split - 2 for 1']
+      gc.collect()
+      self.assertEqual([], [row() for row in rejected if row() is not None])
+
+    sut = SymbolFilter(['RIM'], (0, 1, 2)).select(rows())
+    self.assertEqual(['RIM', 'BB'], [row[1] for row in sut])
+
+
+class Row(list):
+  """
+  A row that can be weakly referenced.
+  """
+
+
+class PortfolioSerializersTest(TestCase):
+
+  CONVERTER = CurrencyConverter()
+
+  def portfolio(self):
+    holdings = [
+      Holding('IL', 'Illuminati', 'BY', 120, 10, 'USD'),
+      Holding('FM', 'Freemasons', 'US', 250, 25, 'USD')
+    ]
+    portfolio = Portfolio(holdings, self.CONVERTER, 550, date=date(2015, 6, 22))
+    StockSplitAction(1, 2).update(holdings[1], portfolio)
+    return portfolio
+
+  def test_csv_holdings_plain_numbers(self):
+    holdings = CsvPortfolioSerializer.deserialize_holdings([
+      "Currency,Symbol,Description,Country,Shares,Price",
+      "USD,IL,Illuminati,BY,120,10.25",
+      "",
+      "USD,FM,Freemasons,US,250,25",
+    ])
+    self.assertEqual([('IL', 120, 10.25), ('FM', 250, 25.0)], [(h.symbol, h.shares, h.price) for h in holdings])
+    self.assertEqual([int, float], [type(holdings[0].shares), type(holdings[0].price)])
+
+  def test_csv_holdings_grouped_numbers(self):
+    # atoi/atof read en_US-style separators, without needing that locale installed
+    conventions = dict(locale.localeconv(), decimal_point='.', thousands_sep=',')
+    saved, locale.localeconv = locale.localeconv, lambda: conventions
+    try:
+      holdings = CsvPortfolioSerializer.deserialize_holdings([
+        "Symbol,Description,Country,Shares,Price,Currency",
+        'IL,Illuminati,BY,"1,200","1,234.50",USD',
+        "FM,Freemasons,US,250,25.75,USD",
+      ])
+    finally:
+      locale.localeconv = saved
+    self.assertEqual([(1200, 1234.5), (250, 25.75)], [(h.shares, h.price) for h in holdings])
+
+  def test_csv_changed_only(self):
+    lines = CsvPortfolioSerializer.serialize(self.portfolio(), changed_only=True).getvalue().splitlines()
+    self.assertEqual(['Symbol', 'FM', 'CASH', 'TOTAL'], [line.split(',')[0] for line in lines])
+
+  def test_binary_round_trip(self):
+    stream = BytesIO()
+    BinaryPortfolioSerializer.serialize(self.portfolio(), stream)
+    BinaryPortfolioSerializer.serialize(self.portfolio(), stream, changed_only=True)
+    stream.seek(0)
+    days = list(BinaryPortfolioSerializer.deserialize(stream))
+    self.assertEqual(2, len(days))
+    self.assertEqual((date(2015, 6, 22), 550, 8000, 'USD'), days[0][:4])
+    self.assertEqual([('FM', 'Freemasons', 'US', 'USD', 500, 12.5, 6250)], days[1][4])
+    self.assertEqual(2, len(days[0][4]))
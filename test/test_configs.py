@@ -0,0 +1,186 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+import configs
+from array import array
+from configs import ConfigCache, GatewayRisk, Transport, load_gateway_limits, parse_gateway_risks, parse_transports
+
+parsed = []
+
+
+def read_lines(filename):
+  parsed.append(filename)
+  with open(filename) as f:
+    return f.read().splitlines()
+
+
+class ParseTest(TestCase):
+
+  def setUp(self):
+    self.directory = mkdtemp()
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def write(self, *lines):
+    filename = os.path.join(self.directory, 'config.txt')
+    with open(filename, 'w') as f:
+      f.writelines(line + '\n' for line in lines)
+    return filename
+
+  def test_parse_gateway_risks(self):
+    filename = self.write("exchangeA_groupA.gateway_risk=A 10 -5 BB 7 8",
+                          "# not a gateway risk",
+                          "exchangeB_groupC.gateway_risk=C 1 2")
+    self.assertEqual([
+      GatewayRisk('exchangeA', 'groupA', 'A', 10, -5),
+      GatewayRisk('exchangeA', 'groupA', 'BB', 7, 8),
+      GatewayRisk('exchangeB', 'groupC', 'C', 1, 2),
+    ], list(parse_gateway_risks(filename)))
+    self.assertEqual({
+      ('exchangeA', 'groupA'): (['A', 'BB'], array('l', [10, 7]), array('l', [-5, 8])),
+      ('exchangeB', 'groupC'): (['C'], array('l', [1]), array('l', [2])),
+    }, load_gateway_limits(filename))
+
+  def test_parse_without_trailing_newline(self):
+    filename = self.write()
+    with open(filename, 'w') as f:
+      f.write("exchangeA_groupA.gateway_risk=A 10 10")
+    self.assertEqual([GatewayRisk('exchangeA', 'groupA', 'A', 10, 10)], list(parse_gateway_risks(filename)))
+    self.assertEqual({('exchangeA', 'groupA'): (['A'], array('l', [10]), array('l', [10]))}, load_gateway_limits(filename))
+
+  def test_parse_transports(self):
+    filename = self.write("transport.groupB_3096.exchangeA_5=53413 ;239.189.17.13 7990",
+                          "",
+                          "transport.groupB_3096.exchangeA_6=50001 ;10.1 7990")
+    self.assertEqual([Transport(1, '239.189.17.13', 53413), Transport(3, '10.1', 50001)], list(parse_transports(filename)))
+
+
+class ConfigCacheTest(TestCase):
+
+  def setUp(self):
+    self.directory = mkdtemp()
+    self.path = os.path.join(self.directory, 'cache')
+    self.filename = self.write('config.txt', 'a', 'b')
+    del parsed[:]
+
+  def tearDown(self):
+    rmtree(self.directory)
+    read_lines.__dict__.pop('format', None)
+    read_lines.__dict__.pop('cacheable', None)
+
+  def write(self, name, *lines):
+    filename = os.path.join(self.directory, name)
+    with open(filename, 'w') as f:
+      f.writelines(line + '\n' for line in lines)
+    return filename
+
+  def test_hit(self):
+    sut = ConfigCache()
+    self.assertEqual(['a', 'b'], sut.load(self.filename, read_lines))
+    self.assertEqual(['a', 'b'], sut.load(self.filename, read_lines))
+    self.assertEqual([self.filename], parsed)
+    self.assertEqual((1, 1), (sut.hits, sut.misses))
+
+  def test_hit_across_runs(self):
+    first = ConfigCache(self.path)
+    first.load(self.filename, read_lines)
+    first.save()
+
+    sut = ConfigCache(self.path)
+
+    self.assertEqual(['a', 'b'], sut.load(self.filename, read_lines))
+    self.assertEqual([self.filename], parsed)
+
+  def test_modified_time_changed(self):
+    sut = ConfigCache()
+    sut.load(self.filename, read_lines)
+    status = os.stat(self.filename)
+    os.utime(self.filename, (status.st_atime, status.st_mtime + 10))
+    sut.load(self.filename, read_lines)
+    self.assertEqual(2, len(parsed))
+
+  def test_size_changed(self):
+    sut = ConfigCache()
+    sut.load(self.filename, read_lines)
+    status = os.stat(self.filename)
+    self.write('config.txt', 'a', 'b', 'c')
+    os.utime(self.filename, (status.st_atime, status.st_mtime))
+    self.assertEqual(['a', 'b', 'c'], sut.load(self.filename, read_lines))
+    self.assertEqual(2, len(parsed))
+
+  def test_format_changed(self):
+    first = ConfigCache(self.path)
+    first.load(self.filename, read_lines)
+    first.save()
+    read_lines.format = 1
+
+    sut = ConfigCache(self.path)
+    sut.load(self.filename, read_lines)
+
+    self.assertEqual(2, len(parsed))
+
+  def test_uncacheable_results_parsed_again(self):
+    read_lines.cacheable = lambda lines: 'b' not in lines
+    other = self.write('other.txt', 'c')
+    first = ConfigCache(self.path)
+    self.assertEqual(['a', 'b'], first.load(self.filename, read_lines))
+    first.load(other, read_lines)
+    self.assertEqual(['a', 'b'], first.load(self.filename, read_lines))
+    first.save()
+
+    sut = ConfigCache(self.path)
+
+    self.assertEqual([ConfigCache.key(other, read_lines)], sut.entries.keys())
+    sut.load(self.filename, read_lines)
+    sut.load(other, read_lines)
+    self.assertEqual([self.filename, other, self.filename, self.filename], parsed)
+
+  def test_refresh_through_map(self):
+    other = self.write('other.txt', 'c')
+    sut = ConfigCache()
+    sut.load(self.filename, read_lines)
+    mapped = []
+    sut.refresh([self.filename, other], read_lines, lambda f, items: mapped.extend(items) or map(f, items))
+    self.assertEqual([other], mapped)
+    self.assertEqual(['c'], sut.cached(other, read_lines))
+
+  def test_save_is_atomic(self):
+    first = ConfigCache(self.path)
+    first.load(self.filename, read_lines)
+    first.save()
+    self.assertEqual(['cache', 'config.txt'], sorted(os.listdir(self.directory)))
+
+    def interrupted(value, f, protocol):
+      f.write('partial')
+      raise KeyboardInterrupt()
+
+    sut = ConfigCache(self.path)
+    sut.load(self.write('other.txt', 'c'), read_lines)
+    dump, configs.pickle.dump = configs.pickle.dump, interrupted
+    try:
+      self.assertRaises(KeyboardInterrupt, sut.save)
+    finally:
+      configs.pickle.dump = dump
+    self.assertEqual(['cache', 'config.txt', 'other.txt'], sorted(os.listdir(self.directory)))
+
+    self.assertEqual(['a', 'b'], ConfigCache(self.path).load(self.filename, read_lines))
+    self.assertEqual(2, len(parsed))
+
+  def test_unreadable_cache_ignored(self):
+    with open(self.path, 'w') as f:
+      f.write('not a pickle')
+    self.assertEqual({}, ConfigCache(self.path).entries)
+
+  def test_missing_files_dropped_on_save(self):
+    other = self.write('other.txt', 'c')
+    first = ConfigCache(self.path)
+    first.load(self.filename, read_lines)
+    first.load(other, read_lines)
+    first.save()
+    os.remove(other)
+
+    ConfigCache(self.path).save()
+
+    self.assertEqual([ConfigCache.key(self.filename, read_lines)], ConfigCache(self.path).entries.keys())
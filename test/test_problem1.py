@@ -0,0 +1,114 @@
+import os
+import random
+from itertools import combinations
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from configs import load_gateway_limits
+from problem1 import GatewayRiskIndex, iter_gateway_risks, parse_exchanges
+
+GROUPS = [(exchange, group) for exchange in ('exchangeA', 'exchangeB', 'exchangeC') for group in ('groupA', 'groupB')]
+
+
+class GatewayRiskIndexTest(TestCase):
+
+  def setUp(self):
+    generator = random.Random(7)
+    self.symbols = ['S%03d' % i for i in xrange(60)]
+    self.carried = {group: [s for s in self.symbols if generator.random() < 0.7] for group in GROUPS}
+    self.queried = self.symbols + ['UNKNOWN']
+    self.directory = mkdtemp()
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def index(self):
+    index = GatewayRiskIndex()
+    for (exchange, group), symbols in self.carried.iteritems():
+      index.add(exchange, group, symbols)
+    return index
+
+  def queries(self):
+    for size in (1, 2, 3):
+      for groups in combinations(GROUPS, size):
+        yield groups
+    yield [('exchangeD', 'groupA')]
+    yield []
+
+  def test_missing_from_all(self):
+    sut = self.index()
+    for groups in self.queries():
+      expected = [s for s in self.queried if not any(s in self.carried.get(g, ()) for g in groups)]
+      self.assertEqual(expected, sut.missing_from_all(self.queried, groups), groups)
+
+  def test_missing_from_any(self):
+    sut = self.index()
+    for groups in self.queries():
+      expected = [s for s in self.queried if not all(s in self.carried.get(g, ()) for g in groups)]
+      self.assertEqual(expected, sut.missing_from_any(self.queried, groups), groups)
+
+  def test_load(self):
+    filename = os.path.join(self.directory, 'fileB.txt')
+    with open(filename, 'w') as f:
+      for (exchange, group), symbols in sorted(self.carried.iteritems()):
+        f.write('%s_%s.gateway_risk=%s\n' % (exchange, group, ' '.join('%s 10 -5' % s for s in symbols)))
+
+    sut = GatewayRiskIndex.load(filename)
+
+    self.assertEqual(set(GROUPS), sut.groups)
+    for symbol in self.queried:
+      self.assertEqual({g for g in GROUPS if symbol in self.carried[g]}, sut.groups_for(symbol))
+
+
+class GatewayRiskParsingTest(TestCase):
+
+  def setUp(self):
+    self.directory = mkdtemp()
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def write(self, lines):
+    filename = os.path.join(self.directory, 'fileB.txt')
+    with open(filename, 'w') as f:
+      f.writelines(line + '\n' for line in lines)
+    return filename
+
+  def assertMatchesSplitParser(self, filename):
+    expected = parse_exchanges(line.rstrip() for line in open(filename))
+    actual = {}
+    for exchange, group, symbol, limit1, limit2 in iter_gateway_risks(filename):
+      actual.setdefault((exchange, group), {})[symbol] = [str(limit1), str(limit2)]
+    self.assertEqual(expected, actual)
+
+    limits = {}
+    for key, (symbols, limits1, limits2) in load_gateway_limits(filename).iteritems():
+      self.assertEqual(len(symbols), len(set(symbols)))
+      self.assertEqual((len(symbols), 'l', 'l'), (len(limits1), limits1.typecode, limits2.typecode))
+      limits[key] = {symbol: [str(limit1), str(limit2)] for symbol, limit1, limit2 in zip(symbols, limits1, limits2)}
+    self.assertEqual(expected, limits)
+
+    index = GatewayRiskIndex.load(filename)
+    self.assertEqual(load_gateway_limits(filename), index.limits)
+    for key, risks in expected.iteritems():
+      for symbol in risks:
+        self.assertIn(key, index.groups_for(symbol))
+    self.assertEqual(sum(len(risks) for risks in expected.itervalues()),
+                     sum(len(groups) for groups in index.groups_by_symbol.itervalues()))
+
+  def test_sample(self):
+    self.assertMatchesSplitParser(os.path.join(os.path.dirname(__file__), os.pardir, 'fileB.txt'))
+
+  def test_generated(self):
+    generator = random.Random(3)
+    lines = []
+    for exchange, group in GROUPS:
+      risks = ['S%04d %d %d' % (i, generator.randint(-100, 100), generator.randint(0, 10 ** 6))
+               for i in xrange(3000) if generator.random() < 0.8]
+      lines.append('%s_%s.gateway_risk=%s' % (exchange, group, ' '.join(risks)))
+    self.assertMatchesSplitParser(self.write(lines))
+
+  def test_empty(self):
+    self.assertEqual([], list(iter_gateway_risks(self.write([]))))
+    self.assertEqual({}, load_gateway_limits(self.write([])))
+    self.assertEqual(set(), GatewayRiskIndex.load(self.write([])).groups)
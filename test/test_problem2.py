@@ -0,0 +1,113 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from configs import ConfigCache
+import problem2
+from problem2 import Finding, audit, calculate_port, calculate_ports, config_files, find_mismatches
+
+
+class CalculatePortsTest(TestCase):
+
+  VALID = ['239.189.3.13', '0.0.0.0', '255.255.255.255', '10.0.1.2', '239.189.3.13']
+  MALFORMED = ['10.1', '1.2.3', '1.2.3.300', '1.2.3.4.5', '1.2.3.-4', '1.2.3.', 'a.b.3.4', '1.2.3.4 ', '']
+
+  def test_calculate_port(self):
+    self.assertEqual(50000 + 200 * 3 + 13, calculate_port('239.189.3.13'))
+    for ip in self.MALFORMED:
+      self.assertRaises(ValueError, calculate_port, ip)
+
+  def test_calculate_ports(self):
+    self.assertEqual([calculate_port(ip) for ip in self.VALID], calculate_ports(self.VALID))
+    for ip in self.MALFORMED:
+      self.assertRaises(ValueError, calculate_ports, self.VALID + [ip])
+
+
+class AuditTest(TestCase):
+
+  LINES = [
+    "transport.groupB_1.exchangeA_1=50613 ;239.189.3.13 7990",
+    "# a comment",
+    "transport.groupB_1.exchangeA_2=50614 ;239.189.3.13 7990",
+    "transport.groupB_1.exchangeA_3=50000 ;239.189.0.0 7990",
+    "transport.groupB_1.exchangeA_4=50001 ;10.1 7990",
+    "transport.groupB_1.exchangeA_5=50200 ;239.189.1.1 7990",
+  ]
+
+  def setUp(self):
+    self.directory = mkdtemp()
+
+  def tearDown(self):
+    rmtree(self.directory)
+
+  def write(self, path, lines=LINES):
+    filename = os.path.join(self.directory, path)
+    if not os.path.isdir(os.path.dirname(filename)):
+      os.makedirs(os.path.dirname(filename))
+    with open(filename, 'w') as f:
+      f.writelines(line + '\n' for line in lines)
+    return filename
+
+  def test_config_files(self):
+    for path in ('b/2.txt', 'b/1.txt', 'a/z/1.txt', 'a/3.txt', 'c.txt'):
+      self.write(path)
+    single = self.write('single.txt')
+    root = self.directory
+
+    sut = list(config_files([single, root]))
+
+    expected = ['c.txt', 'single.txt', 'a/3.txt', 'a/z/1.txt', 'b/1.txt', 'b/2.txt']
+    self.assertEqual([single] + [os.path.join(root, path) for path in expected], sut)
+
+  def test_find_mismatches(self):
+    filename = self.write('fileC.txt')
+    sut = find_mismatches(filename)
+    self.assertEqual([
+      Finding(filename, 3, '239.189.3.13', 50613, 50614, None),
+      Finding(filename, 6, '239.189.1.1', 50201, 50200, None),
+    ], [finding for finding in sut if not finding.error])
+    self.assertEqual([(5, '10.1', None, 50001)], [(f.line, f.ip, f.expected_port, f.actual_port) for f in sut if f.error])
+
+  def test_find_mismatches_in_chunks(self):
+    filename = self.write('fileC.txt')
+    self.assertEqual(find_mismatches(filename), find_mismatches(filename, chunk_size=2))
+
+  def test_unreadable_file(self):
+    missing = os.path.join(self.directory, 'missing.txt')
+    sut = find_mismatches(missing)
+    self.assertEqual([(missing, None)], [(f.filename, f.line) for f in sut])
+    self.assertTrue(sut[0].error)
+
+  def test_read_errors_not_cached(self):
+    filename = self.write('fileC.txt')
+    path = os.path.join(self.directory, 'cache')
+
+    def unreadable(filename):
+      raise IOError(13, 'Permission denied', filename)
+
+    extract_transports, problem2.extract_transports = problem2.extract_transports, unreadable
+    try:
+      cache = ConfigCache(path)
+      self.assertIn('Permission denied', cache.load(filename, find_mismatches)[0].error)
+      cache.save()
+    finally:
+      problem2.extract_transports = extract_transports
+
+    self.assertEqual(find_mismatches(filename), ConfigCache(path).load(filename, find_mismatches))
+
+  def test_serial_and_parallel(self):
+    for i in xrange(6):
+      self.write('%d/fileC.txt' % i, self.LINES[i:] + self.LINES[:i])
+    os.symlink(os.path.join(self.directory, 'missing.txt'), os.path.join(self.directory, '3', 'broken.txt'))
+
+    serial = audit([self.directory], workers=1)
+    parallel = audit([self.directory], workers=3)
+    cache = ConfigCache()
+    uncached, cached = audit([self.directory], 2, cache), audit([self.directory], 2, cache)
+
+    self.assertEqual(serial, parallel)
+    self.assertEqual(serial, uncached)
+    self.assertEqual(serial, cached)
+    self.assertEqual(6, cache.hits)
+    self.assertEqual(6 * 3 + 1, len(serial))
+    self.assertEqual(sorted(serial, key=lambda f: (f.filename, f.line)), serial)